@@ -1 +1,42 @@
-from .hash_impl import *
\ No newline at end of file
+import importlib
+
+# Public names, grouped by the submodule that defines them. The submodules pull in
+# NetworkX and pynauty, so they are only imported the first time one of their names is
+# accessed. This keeps `import dihash` (and the dihash command line tool) cheap.
+_exports = {
+    'hash_impl': [
+        'nauty_graph', 'canonize', 'escape', 'to_str', 'orbits', 'analyze_graph',
+        'compose_dicts', 'num_to_bit_counts', 'edge_labeled_digraph_to_digraph',
+        'max_num_multiedges', 'multigraph_to_edge_labeled_digraph', 'quotient_graph',
+        'quotient_fixpoint', 'invert_dict', 'invert_list', 'sort_orbits',
+        'canonical_orbits_mapping', 'hash_sha256', 'hash_graph', 'hash_graph_node_set',
+        'hash_scc', 'merkle_hash_graph', 'GRAPH_NODE_BYTES', 'GRAPH_EDGE_BYTES', 'HASH_FIXED_BYTES',
+        'HASH_NODE_BYTES', 'HASH_EDGE_BYTES', 'QUOTIENT_NODE_BYTES', 'QUOTIENT_EDGE_BYTES',
+        'CONDENSATION_NODE_BYTES', 'CONDENSATION_SCC_BYTES', 'CONDENSATION_EDGE_BYTES', 'MemoryBudgetExceeded', 'estimate_hash_memory', 'estimate_memory',
+        'estimate_merkle_memory', 'check_memory_budget', 'indexed_nauty_graph', 'hash_indexed_graph',
+        'scc_graph', 'CHECKPOINT_VERSION', 'checkpoint_header', 'read_checkpoint', 'open_checkpoint',
+        'write_checkpoint_records', 'nauty_lock', 'hash_graphs_threaded', 'hash_sccs_threaded', 'isomorphism',
+    ],
+    'invariant': ['quick_invariant', 'dedup_graphs'],
+    'builder': ['MerkleBuilder', 'CyclicGroup', 'single_node_scc_hash'],
+    'generate': ['generate_digraphs', 'generate_digraphs_part', 'generate_digraphs_parallel', 'digraph_to_networkx'],
+    'tree': ['TREE_HASH_VERSION', 'is_out_forest', 'is_out_tree', 'hash_tree'],
+    'server': ['HashServer'],
+    'client': ['HashClient'],
+    'shared_graph': ['SharedGraphBatch', 'AttachedGraphBatch', 'hash_shared_graphs', 'hash_graphs_shared'],
+}
+
+__all__ = [name for names in _exports.values() for name in names]
+
+def __getattr__(name):
+    if name in _exports:
+        return importlib.import_module('.' + name, __name__)
+    for (module_name, names) in _exports.items():
+        if name in names:
+            value = getattr(importlib.import_module('.' + module_name, __name__), name)
+            globals()[name] = value
+            return value
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__) | set(_exports))
@@ -5,6 +5,9 @@ import dihash
 import multiprocessing
 import statistics
 import math
+import resource
+import sys
+import tracemalloc
 
 def run_with_limited_time(func, args, kwargs, time):
     """Runs a function with time limit
@@ -140,10 +143,241 @@ def benchmark_time_distribution(num_nodes, num_trials, compute_graph_size, outpu
             f.write(str(duration))
             f.write('\n')
 
+def peak_rss_bytes():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes on Linux
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+# The public entry points whose memory use is measured by benchmark_memory
+memory_entry_points = {
+    'hash_graph': lambda g: dihash.hash_graph(g, hash_nodes=True, apply_quotient=False),
+    'hash_graph_quotient': lambda g: dihash.hash_graph(g, hash_nodes=True, apply_quotient=True),
+    'hash_graph_node_set': lambda g: dihash.hash_graph_node_set(g, set(list(g.nodes())[:2])),
+    'merkle_hash_graph': lambda g: dihash.merkle_hash_graph(g, apply_quotient=False),
+    'merkle_hash_graph_quotient': lambda g: dihash.merkle_hash_graph(g, apply_quotient=True),
+    'quotient_fixpoint': lambda g: dihash.quotient_fixpoint(g),
+    'edge_labeled_digraph_to_digraph': lambda g: dihash.edge_labeled_digraph_to_digraph(dihash.multigraph_to_edge_labeled_digraph(nx.MultiDiGraph(g))),
+}
+
+# The estimate that the memory_budget argument of each entry point is checked against
+memory_entry_point_estimates = {
+    'hash_graph': lambda g: dihash.estimate_memory(g),
+    'hash_graph_quotient': lambda g: dihash.estimate_memory(g, apply_quotient=True),
+    'hash_graph_node_set': lambda g: dihash.estimate_memory(g) + g.number_of_nodes() * dihash.GRAPH_NODE_BYTES + g.number_of_edges() * dihash.GRAPH_EDGE_BYTES,
+    'merkle_hash_graph': lambda g: dihash.estimate_merkle_memory(g, nx.condensation(g)),
+    'merkle_hash_graph_quotient': lambda g: dihash.estimate_merkle_memory(g, nx.condensation(g), apply_quotient=True),
+}
+
+# Measures the memory used by a single call of an entry point. The peak RSS growth is
+# measured first, since tracemalloc itself allocates memory for every traced block. Both
+# measurements should be made in a fresh process, since the RSS high water mark never goes
+# down within a process.
+def measure_memory(entry_point, g):
+    rss_before = peak_rss_bytes()
+    memory_entry_points[entry_point](g)
+    rss_growth = peak_rss_bytes() - rss_before
+
+    tracemalloc.start()
+    memory_entry_points[entry_point](g)
+    (_, traced_peak) = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return (traced_peak, rss_growth)
+
+# Writes the median tracemalloc peak, the median peak RSS growth and the median memory_budget
+# estimate (or an empty column if the entry point has no estimate) for each graph size
+def benchmark_memory(start_trial, max_trial, compute_graph_size, output_file, entry_point, num_trials_per_run=10, timeout=60):
+    with open(output_file, "w") as f:
+        for trial_i in range(start_trial, max_trial):
+            print("Running trial " + str(trial_i))
+
+            def run_measure(ret_measurements):
+                g = generate_graph(trial_i, compute_graph_size)
+                estimate = None
+                if entry_point in memory_entry_point_estimates:
+                    estimate = memory_entry_point_estimates[entry_point](g)
+                (traced_peak, rss_growth) = measure_memory(entry_point, g)
+                ret_measurements.append((traced_peak, rss_growth, estimate))
+
+            ret_measurements = manager.list()
+            for _ in range(num_trials_per_run):
+                if not run_with_limited_time(run_measure, [ret_measurements], {}, timeout):
+                    print("timeout")
+
+            measurements = list(ret_measurements)
+            if len(measurements) == 0:
+                continue
+            estimates = [e for (_, _, e) in measurements if e is not None]
+
+            f.write(str(trial_i))
+            f.write(',')
+            f.write(str(statistics.median([p for (p, _, _) in measurements])))
+            f.write(',')
+            f.write(str(statistics.median([r for (_, r, _) in measurements])))
+            f.write(',')
+            f.write(str(statistics.median(estimates)) if estimates else '')
+            f.write('\n')
+
+def hash_graph_with_defaults(g):
+    return dihash.hash_graph(g)
+
+# Compares two ways of hashing many small graphs (such as the SCCs of a merkle hash) with a process pool:
+# pickling the NetworkX graphs to the workers, and transporting them with dihash.shared_graph. Writes the
+# median duration of each for every graph size.
+def benchmark_shared_memory_transport(start_trial, max_trial, compute_graph_size, output_file, num_graphs=1000, num_runs=5, processes=None, chunksize=16):
+    from dihash.shared_graph import hash_graphs_shared
+
+    with multiprocessing.Pool(processes) as pool, open(output_file, "w") as f:
+        for trial_i in range(start_trial, max_trial):
+            print("Running trial " + str(trial_i))
+            graphs = [generate_graph(trial_i, compute_graph_size) for _ in range(num_graphs)]
+            pickle_durations = []
+            shared_durations = []
+            for _ in range(num_runs):
+                start = time.time()
+                pool.map(hash_graph_with_defaults, graphs, chunksize=chunksize)
+                pickle_durations.append(time.time() - start)
+
+                start = time.time()
+                hash_graphs_shared(graphs, pool=pool, chunksize=chunksize)
+                shared_durations.append(time.time() - start)
+
+            f.write(str(trial_i))
+            f.write(',')
+            f.write(str(statistics.median(pickle_durations)))
+            f.write(',')
+            f.write(str(statistics.median(shared_durations)))
+            f.write('\n')
+
+# Whether this interpreter is running with the GIL. Free-threaded builds of CPython 3.13+ re-enable the GIL
+# when an extension module such as pynauty does not declare support for running without it, unless they
+# are started with PYTHON_GIL=0.
+def gil_enabled():
+    if hasattr(sys, '_is_gil_enabled'):
+        return sys._is_gil_enabled()
+    return True
+
+# Measures how the thread pool execution paths scale with the number of threads. For every thread count,
+# writes the thread count, whether the GIL is enabled, the median duration of hashing num_graphs graphs
+# with hash_graphs_threaded, and the median duration of merkle_hash_graph(max_workers=...) on a graph made
+# of num_graphs such graphs connected in a chain. Every run goes through all thread counts in turn, so that
+# a machine that speeds up or slows down during the benchmark affects all thread counts alike.
+def benchmark_thread_scaling(graph_size, thread_counts, output_file, num_graphs=200, num_runs=5):
+    graphs = [generate_graph(graph_size, time_distribution_graph_size) for _ in range(num_graphs)]
+    merkle_g = nx.disjoint_union_all(graphs)
+    offset = 0
+    for g in graphs[:-1]:
+        merkle_g.add_edge(offset, offset + g.number_of_nodes())
+        offset += g.number_of_nodes()
+
+    graph_durations = {num_threads: [] for num_threads in thread_counts}
+    merkle_durations = {num_threads: [] for num_threads in thread_counts}
+    for run_i in range(num_runs):
+        print("Run " + str(run_i + 1) + " of " + str(num_runs))
+        for num_threads in thread_counts:
+            start = time.time()
+            dihash.hash_graphs_threaded(graphs, max_workers=num_threads)
+            graph_durations[num_threads].append(time.time() - start)
+
+            start = time.time()
+            dihash.merkle_hash_graph(merkle_g, max_workers=num_threads)
+            merkle_durations[num_threads].append(time.time() - start)
+
+    with open(output_file, "w") as f:
+        for num_threads in thread_counts:
+            f.write(str(num_threads))
+            f.write(',')
+            f.write(str(gil_enabled()))
+            f.write(',')
+            f.write(str(statistics.median(graph_durations[num_threads])))
+            f.write(',')
+            f.write(str(statistics.median(merkle_durations[num_threads])))
+            f.write('\n')
+
+# Generates a random tree with num_nodes nodes, where the parent of every node is chosen uniformly
+# among the nodes added before it
+def generate_tree(num_nodes):
+    g = nx.DiGraph()
+    for i in range(num_nodes):
+        g.add_node(i)
+        g.nodes[i]['label'] = random.choice(['a', 'b'])
+        if i > 0:
+            g.add_edge(random.randrange(i), i)
+    return g
+
+# Compares hash_tree with hash_graph on random trees. For every tree size, writes the median duration of
+# hash_tree and of hash_graph over num_runs trees. hash_graph runs in a separate process, and its column
+# is left empty if it does not finish within timeout seconds.
+def benchmark_tree_hash(tree_sizes, output_file, num_runs=5, timeout=60):
+    def run_hash_graph(g, ret_duration):
+        start = time.time()
+        dihash.hash_graph(g)
+        ret_duration.append(time.time() - start)
+
+    with open(output_file, "w") as f:
+        for num_nodes in tree_sizes:
+            print("Running tree size " + str(num_nodes))
+            tree_durations = []
+            graph_durations = manager.list()
+            timed_out = False
+            for _ in range(num_runs):
+                g = generate_tree(num_nodes)
+                start = time.time()
+                dihash.hash_tree(g)
+                tree_durations.append(time.time() - start)
+                if not timed_out:
+                    timed_out = not run_with_limited_time(run_hash_graph, [g, graph_durations], {}, timeout)
+            f.write(str(num_nodes))
+            f.write(',')
+            f.write(str(statistics.median(tree_durations)))
+            f.write(',')
+            if not timed_out:
+                f.write(str(statistics.median(graph_durations)))
+            f.write('\n')
+
+# Compares quick_invariant and dedup_graphs with hash_graph on lists of num_graphs random graphs. For every
+# graph size, writes the median duration over num_runs runs of computing quick_invariant for every graph,
+# of dedup_graphs on the whole list and of hash_graph for every graph, all in seconds per graph.
+def benchmark_quick_invariant(graph_sizes, output_file, num_graphs=300, num_runs=5):
+    with open(output_file, "w") as f:
+        for num_nodes in graph_sizes:
+            print("Running graph size " + str(num_nodes))
+            graphs = [generate_graph(num_nodes, time_distribution_graph_size) for _ in range(num_graphs)]
+            invariant_durations = []
+            dedup_durations = []
+            graph_durations = []
+            for _ in range(num_runs):
+                start = time.time()
+                for g in graphs:
+                    dihash.quick_invariant(g)
+                invariant_durations.append((time.time() - start) / num_graphs)
+
+                start = time.time()
+                dihash.dedup_graphs(graphs)
+                dedup_durations.append((time.time() - start) / num_graphs)
+
+                start = time.time()
+                for g in graphs:
+                    dihash.hash_graph(g, hash_nodes=False)
+                graph_durations.append((time.time() - start) / num_graphs)
+            f.write(str(num_nodes))
+            f.write(',')
+            f.write(str(statistics.median(invariant_durations)))
+            f.write(',')
+            f.write(str(statistics.median(dedup_durations)))
+            f.write(',')
+            f.write(str(statistics.median(graph_durations)))
+            f.write('\n')
+
 # Uncomment one or more of the following lines to run benchmarks
 
 #benchmark(0, 1000, nodes_compute_graph_size, "graph_hash_1-1000_nodes.csv")
 #benchmark_time_distribution(500, 1000, time_distribution_graph_size, "graph_hash_time_distribution-500_nodes.csv")
 #benchmark(0, 1000, nodes_compute_graph_size, "graph_hash_all_nodes_1-1000_nodes.csv", hash_nodes=True)
 #benchmark(0, 1000, nodes_compute_graph_size, "graph_hash_quotient_1-1000_nodes.csv", hash_nodes=False, apply_quotient=True)
-benchmark_merkle_hash(0, 1000, nodes_compute_graph_size, "merkle_graph_hash_1-1000_nodes.csv", apply_quotient=False)
\ No newline at end of file
+benchmark_merkle_hash(0, 1000, nodes_compute_graph_size, "merkle_graph_hash_1-1000_nodes.csv", apply_quotient=False)
+#for entry_point in memory_entry_points:
+#    benchmark_memory(0, 1000, nodes_compute_graph_size, entry_point + "_memory_1-1000_nodes.csv", entry_point)
+#benchmark_shared_memory_transport(0, 50, nodes_compute_graph_size, "shared_memory_transport_1-50_nodes.csv")
+#benchmark_thread_scaling(30, [1, 2, 4, 8, 16], "thread_scaling_30_nodes.csv", num_runs=15)
+#benchmark_tree_hash([10, 100, 1000, 10000, 100000], "tree_hash_10-100000_nodes.csv")
+#benchmark_quick_invariant([5, 10, 20, 30, 50, 100], "quick_invariant_5-100_nodes.csv")
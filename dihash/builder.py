@@ -0,0 +1,145 @@
+import networkx as nx
+from .hash_impl import hash_graph, hash_sha256, to_str
+
+# Hash-consing construction of graphs whose merkle hashes are computed as the graph is built.
+#
+# Nodes are added bottom-up: every successor of a new node must already have been added, and a
+# node is identified by its hash. A node whose successors all exist forms a trivial SCC, and its
+# hash is computed directly from its label and the hashes of its successors, without nauty.
+# Nodes that lie on a cycle are added together as a cyclic group, which is hashed with hash_graph
+# when it is closed. Structurally identical nodes have identical hashes, so they are stored once.
+#
+# The hashes are identical to the node_hashes computed by merkle_hash_graph for the same graph
+# (without a graph label), built with the same apply_quotient and string_hash_fun.
+
+# Computes the hash of a node that forms an SCC on its own, exactly as merkle_hash_graph would.
+# successor_hashes are the hashes of its successors (other than itself) and self_loop is True if
+# the node has an edge to itself.
+def single_node_scc_hash(label, successor_hashes, self_loop, string_hash_fun=hash_sha256):
+    scc_label = string_hash_fun(to_str((label, sorted(successor_hashes))))
+    # This is the summary hash_indexed_graph computes for a graph with one node. Its only orbit
+    # has index 0, and a graph with one node is its own quotient.
+    g_hash = string_hash_fun(to_str(([scc_label], [(0, 0)] if self_loop else [])))
+    return string_hash_fun(to_str((0, g_hash)))
+
+class MerkleBuilder:
+    def __init__(self, apply_quotient=False, string_hash_fun=hash_sha256):
+        self.apply_quotient = apply_quotient
+        self.string_hash_fun = string_hash_fun
+        # Maps the hash of every stored node to ('node', label, sorted successor hashes) for nodes
+        # that form a trivial SCC, or to ('group', scc_hash, local index) for nodes of a cyclic group
+        self.nodes = {}
+        # Maps the hash of every stored cyclic group to its labels, internal edges (between local
+        # indices), lists of external successor hashes and node hashes
+        self.groups = {}
+
+    def check_successors(self, successors):
+        for h in successors:
+            if h not in self.nodes:
+                raise KeyError("Successor {} has not been added to the builder".format(h))
+
+    # Adds a node whose successors have all been added already, and returns its hash.
+    # successors is a list of hashes. A hash that appears k times stands for k distinct (but
+    # structurally identical) successor nodes.
+    def add_node(self, label, successors=()):
+        successors = sorted(successors)
+        self.check_successors(successors)
+        h = single_node_scc_hash(label, successors, False, self.string_hash_fun)
+        if h not in self.nodes:
+            self.nodes[h] = ('node', label, tuple(successors))
+        return h
+
+    # Starts a group of nodes that form a cycle. See CyclicGroup.
+    def cyclic_group(self):
+        return CyclicGroup(self)
+
+    def __contains__(self, h):
+        return h in self.nodes
+
+    # The number of distinct nodes stored
+    def __len__(self):
+        return len(self.nodes)
+
+    def label(self, h):
+        entry = self.nodes[h]
+        if entry[0] == 'node':
+            return entry[1]
+        (labels, _, _, _) = self.groups[entry[1]]
+        return labels[entry[2]]
+
+    # Returns the hashes of the successors of the node with hash h
+    def successors(self, h):
+        entry = self.nodes[h]
+        if entry[0] == 'node':
+            return list(entry[2])
+        (_, scc_hash, i) = entry
+        (_, edges, external_successors, node_hashes) = self.groups[scc_hash]
+        return sorted(external_successors[i] + [node_hashes[t] for (s, t) in edges if s == i])
+
+    def add_group(self, labels, edges, external_successors, node_hashes, scc_hash):
+        if scc_hash in self.groups:
+            return
+        self.groups[scc_hash] = (labels, edges, external_successors, node_hashes)
+        for (i, h) in enumerate(node_hashes):
+            if h not in self.nodes:
+                self.nodes[h] = ('group', scc_hash, i)
+
+# A group of nodes that form a strongly connected component, created by MerkleBuilder.cyclic_group.
+# Nodes are added with add_node, which returns a local handle, and connected with add_edge. Edges to
+# nodes outside of the group are given as successor hashes, so those nodes must have been added to
+# the builder already. close() hashes the group and returns the hashes of its nodes.
+class CyclicGroup:
+    def __init__(self, builder):
+        self.builder = builder
+        self.labels = []
+        self.external_successors = []
+        self.edges = set()
+        self.node_hashes = None
+
+    def check_open(self):
+        if self.node_hashes is not None:
+            raise ValueError("The cyclic group has already been closed")
+
+    # Adds a node to the group and returns its local handle
+    def add_node(self, label, successors=()):
+        self.check_open()
+        successors = sorted(successors)
+        self.builder.check_successors(successors)
+        self.labels.append(label)
+        self.external_successors.append(successors)
+        return len(self.labels) - 1
+
+    # Adds an edge between two nodes of the group, given by their local handles
+    def add_edge(self, s, t):
+        self.check_open()
+        for n in (s, t):
+            if not 0 <= n < len(self.labels):
+                raise KeyError("Node {} is not in the cyclic group".format(n))
+        self.edges.add((s, t))
+
+    # Hashes the group and adds it to the builder. Returns a list where element i is the hash of the
+    # node with local handle i. Raises a ValueError if the nodes are not strongly connected.
+    def close(self):
+        self.check_open()
+        builder = self.builder
+        num_nodes = len(self.labels)
+        if num_nodes == 0:
+            raise ValueError("A cyclic group must have at least one node")
+        edges = sorted(self.edges)
+        if num_nodes == 1:
+            h = single_node_scc_hash(self.labels[0], self.external_successors[0], len(edges) > 0, builder.string_hash_fun)
+            (scc_hash, node_hashes) = (h, [h])
+        else:
+            g = nx.DiGraph()
+            for (i, (label, successors)) in enumerate(zip(self.labels, self.external_successors)):
+                g.add_node(i)
+                # The label that merkle_hash_graph gives the node in the graph of its SCC, see scc_graph
+                g.nodes[i]['label'] = builder.string_hash_fun(to_str((label, successors)))
+            g.add_edges_from(edges)
+            if not nx.is_strongly_connected(g):
+                raise ValueError("The nodes of a cyclic group must be strongly connected")
+            (scc_hash, scc_node_hashes) = hash_graph(g, hash_nodes=True, apply_quotient=builder.apply_quotient, string_hash_fun=builder.string_hash_fun)
+            node_hashes = [scc_node_hashes[i] for i in range(num_nodes)]
+        builder.add_group(self.labels, edges, self.external_successors, node_hashes, scc_hash)
+        self.node_hashes = node_hashes
+        return node_hashes
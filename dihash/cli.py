@@ -0,0 +1,246 @@
+import argparse
+import functools
+import itertools
+import json
+import os
+import queue
+import sys
+
+# Command line tool for hashing many graphs in one process (or one pool of processes).
+#
+# NetworkX and pynauty are only imported once there is a graph to hash, so `dihash --help`
+# and small jobs start quickly. Graphs are parsed into plain records (lists of nodes,
+# labels and edges), which are much cheaper to send to worker processes than NetworkX
+# graphs, and the hashes are written out as JSON lines as soon as they are computed.
+
+FORMATS = ['jsonl', 'edgelist', 'graphml']
+
+EXTENSION_FORMATS = {
+    '.jsonl': 'jsonl',
+    '.json': 'jsonl',
+    '.ndjson': 'jsonl',
+    '.edgelist': 'edgelist',
+    '.edges': 'edgelist',
+    '.el': 'edgelist',
+    '.txt': 'edgelist',
+    '.graphml': 'graphml',
+    '.xml': 'graphml',
+}
+
+# A record describes one graph. Nodes are (node, label) pairs, edges are (source, target)
+# pairs, and nodes that only appear in edges receive the empty label. Records that could
+# not be parsed carry an error message instead of a graph.
+def make_record(graph_id, nodes, edges, label=None, error=None):
+    return {'id': graph_id, 'label': label, 'nodes': nodes, 'edges': edges, 'error': error}
+
+def error_record(graph_id, error):
+    return make_record(graph_id, [], [], error=error)
+
+# Each line of a JSON-lines input is an object of the form
+# {"id": "g", "label": "graph label", "nodes": {"0": "a", "1": "b"}, "edges": [["0", "1"]]}
+# where "id" and "label" are optional and "nodes" may also be a list of unlabeled nodes.
+# Node identifiers are converted to strings.
+def parse_jsonl(lines, source):
+    for (line_i, line) in enumerate(lines):
+        line = line.strip()
+        if not line:
+            continue
+        default_id = '{}:{}'.format(source, line_i + 1)
+        try:
+            obj = json.loads(line)
+            graph_id = obj.get('id', default_id)
+            nodes = obj.get('nodes', [])
+            if isinstance(nodes, dict):
+                nodes = [(str(n), label) for (n, label) in nodes.items()]
+            else:
+                nodes = [(str(n), '') for n in nodes]
+            edges = [(str(s), str(t)) for (s, t) in obj.get('edges', [])]
+            yield make_record(graph_id, nodes, edges, label=obj.get('label'))
+        except (ValueError, TypeError, AttributeError) as e:
+            yield error_record(default_id, 'Unable to parse graph: {}'.format(e))
+
+# An edge-list input holds one "source target" pair per line. A line with a single token
+# adds an isolated node, lines starting with '#' are comments and a blank line separates
+# consecutive graphs. All nodes receive the empty label.
+def parse_edgelist(lines, source):
+    graph_i = 0
+    nodes = []
+    edges = []
+    for line in lines:
+        line = line.strip()
+        if line.startswith('#'):
+            continue
+        if not line:
+            if nodes or edges:
+                yield make_record('{}:{}'.format(source, graph_i), nodes, edges)
+                graph_i += 1
+                nodes = []
+                edges = []
+            continue
+        tokens = line.split()
+        if len(tokens) == 1:
+            nodes.append((tokens[0], ''))
+        else:
+            edges.append((tokens[0], tokens[1]))
+    if nodes or edges:
+        yield make_record('{}:{}'.format(source, graph_i), nodes, edges)
+
+# A GraphML input holds a single graph. The 'label' node and graph attributes are used as
+# labels when present. Undirected graphs are treated as digraphs with edges in both
+# directions, and parallel edges are merged.
+def parse_graphml(f, source):
+    import networkx as nx
+    try:
+        g = nx.read_graphml(f)
+    except Exception as e:
+        yield error_record(source, 'Unable to parse graph: {}'.format(e))
+        return
+    g = nx.DiGraph(g)
+    nodes = [(str(n), str(g.nodes[n].get('label', ''))) for n in g.nodes]
+    edges = [(str(s), str(t)) for (s, t) in g.edges]
+    label = g.graph.get('label')
+    yield make_record(source, nodes, edges, label=None if label is None else str(label))
+
+def detect_format(path):
+    return EXTENSION_FORMATS.get(os.path.splitext(path)[1].lower(), 'jsonl')
+
+def read_records(paths, fmt):
+    if not paths:
+        paths = ['-']
+    for path in paths:
+        path_fmt = fmt
+        if path_fmt == 'auto':
+            path_fmt = 'jsonl' if path == '-' else detect_format(path)
+        source = '<stdin>' if path == '-' else path
+        if path_fmt == 'graphml':
+            if path == '-':
+                yield from parse_graphml(sys.stdin.buffer, source)
+            else:
+                with open(path, 'rb') as f:
+                    yield from parse_graphml(f, source)
+        else:
+            parse = parse_jsonl if path_fmt == 'jsonl' else parse_edgelist
+            if path == '-':
+                yield from parse(sys.stdin, source)
+            else:
+                with open(path, 'r') as f:
+                    yield from parse(f, source)
+
+def record_to_graph(record):
+    import networkx as nx
+    g = nx.DiGraph()
+    for (n, label) in record['nodes']:
+        g.add_node(n, label=label)
+    for (s, t) in record['edges']:
+        for n in (s, t):
+            if n not in g:
+                g.add_node(n, label='')
+        g.add_edge(s, t)
+    if record['label'] is not None:
+        g.graph['label'] = record['label']
+    return g
+
+# Hashes a single record. This runs in the worker processes, so it has to be a module level
+# function. The result is the JSON object that is written to the output.
+def hash_record(record, merkle=False, hash_nodes=False, apply_quotient=False):
+    result = {'id': record['id']}
+    if record['error'] is not None:
+        result['error'] = record['error']
+        return result
+    from . import hash_impl
+    try:
+        g = record_to_graph(record)
+        if merkle:
+            (_, _, node_hashes) = hash_impl.merkle_hash_graph(g, apply_quotient=apply_quotient)
+            result['node_hashes'] = node_hashes
+        else:
+            (g_hash, node_hashes) = hash_impl.hash_graph(g, hash_nodes=hash_nodes, apply_quotient=apply_quotient)
+            result['hash'] = g_hash
+            if hash_nodes:
+                result['node_hashes'] = node_hashes
+    except Exception as e:
+        # Any failure, including a RecursionError or MemoryError on an unusually large graph, only fails this
+        # record, so that the graphs after it are still hashed
+        result['error'] = 'Unable to hash graph: {}: {}'.format(type(e).__name__, e)
+    return result
+
+# Hashes a chunk of records in a worker process
+def hash_records(hash_fun, records):
+    return [hash_fun(record) for record in records]
+
+# Hashes the records with a multiprocessing pool and yields the results, in input order or (if unordered) in
+# completion order. Pool.imap reads its whole input ahead of the workers, so instead the records are sent in
+# chunks of chunksize records, and a new chunk is only read once one of the at most max_chunks chunks in
+# flight has been written out. This keeps the memory use bounded for inputs of any length.
+def pool_results(pool, hash_fun, records, chunksize, max_chunks, unordered=False):
+    records = iter(records)
+    chunks = iter(lambda: list(itertools.islice(records, chunksize)), [])
+    # Maps chunk numbers to the AsyncResults of the chunks in flight, in submission order
+    pending = {}
+    # The numbers of the chunks that have finished, in completion order
+    finished = queue.Queue()
+    def submit(chunk_i, chunk):
+        done = lambda _: finished.put(chunk_i)
+        pending[chunk_i] = pool.apply_async(hash_records, (hash_fun, chunk), callback=done, error_callback=done)
+    numbered_chunks = enumerate(chunks)
+    for (chunk_i, chunk) in itertools.islice(numbered_chunks, max_chunks):
+        submit(chunk_i, chunk)
+    while pending:
+        if unordered:
+            chunk_i = finished.get()
+        else:
+            chunk_i = next(iter(pending))
+        results = pending.pop(chunk_i).get()
+        for (next_i, next_chunk) in itertools.islice(numbered_chunks, 1):
+            submit(next_i, next_chunk)
+        yield from results
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog='dihash',
+        description='Hash directed graphs read from files or stdin, writing one JSON line per graph.')
+    parser.add_argument('files', nargs='*',
+        help="Input files. Use '-' or omit to read from stdin.")
+    parser.add_argument('-f', '--format', choices=['auto'] + FORMATS, default='auto',
+        help='Input format. By default it is inferred from the file extension, and stdin is read as JSON lines.')
+    parser.add_argument('-m', '--merkle', action='store_true',
+        help='Use merkle_hash_graph and output the hashes of all nodes.')
+    parser.add_argument('-n', '--node-hashes', action='store_true',
+        help='Also output the hashes of all nodes computed by hash_graph.')
+    parser.add_argument('-q', '--quotient', action='store_true',
+        help='Apply the quotient fixpoint before hashing.')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+        help='Number of worker processes. 0 uses one per CPU.')
+    parser.add_argument('--chunksize', type=int, default=16,
+        help='Number of graphs sent to a worker process at a time.')
+    parser.add_argument('--unordered', action='store_true',
+        help='Write results in completion order instead of input order.')
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    records = read_records(args.files, args.format)
+    hash_fun = functools.partial(hash_record, merkle=args.merkle, hash_nodes=args.node_hashes, apply_quotient=args.quotient)
+    jobs = args.jobs if args.jobs > 0 else os.cpu_count()
+    pool = None
+    if jobs == 1:
+        results = map(hash_fun, records)
+    else:
+        import multiprocessing
+        pool = multiprocessing.Pool(jobs)
+        # Keep two chunks per worker in flight, so that the workers do not wait while results are written
+        results = pool_results(pool, hash_fun, records, args.chunksize, 2 * jobs, args.unordered)
+    num_errors = 0
+    try:
+        for result in results:
+            if 'error' in result:
+                num_errors += 1
+            sys.stdout.write(json.dumps(result) + '\n')
+            sys.stdout.flush()
+    finally:
+        if pool is not None:
+            pool.terminate()
+    return 1 if num_errors > 0 else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
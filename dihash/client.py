@@ -0,0 +1,110 @@
+import json
+import socket
+from . import wire
+
+# Client of the dihash server (see dihash/server.py).
+#
+# Importing this module does not import NetworkX or pynauty. If no server is running (or the
+# connection breaks), the graphs are hashed in the calling process with hash_indexed_graph instead,
+# which gives exactly the same hashes. The server computes the hashes with hash_sha256 and without
+# apply_quotient, so hash_graph(g, hash_nodes) of a client gives the same result as
+# dihash.hash_graph(g, hash_nodes).
+
+# client = dihash.HashClient(socket_path=None, timeout=None, fallback=True)
+#
+# - socket_path: the Unix socket of the server, by default wire.default_socket_path()
+# - timeout: an optional timeout in seconds for connecting to the server and for each request
+# - fallback: if True, graphs are hashed in process when the server is not reachable. If False,
+#   ConnectionError is raised instead.
+#
+# The connection is opened on the first request and kept open until close() is called. The client only
+# connects to a socket owned by the current user, and treats a socket owned by another user as unreachable.
+class HashClient:
+    def __init__(self, socket_path=None, timeout=None, fallback=True):
+        if socket_path is None:
+            socket_path = wire.default_socket_path()
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.fallback = fallback
+        self.sock = None
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    # Sends a request body to the server and returns the response body, or None if the server is not
+    # reachable
+    def request(self, body):
+        for attempt in range(2):
+            if self.sock is None:
+                if not wire.owned_by_current_user(self.socket_path):
+                    return None
+                sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                sock.settimeout(self.timeout)
+                try:
+                    sock.connect(self.socket_path)
+                except OSError:
+                    sock.close()
+                    return None
+                self.sock = sock
+            try:
+                wire.send_message(self.sock, body)
+                response = wire.recv_message(self.sock)
+            except (ConnectionResetError, ConnectionAbortedError, BrokenPipeError):
+                response = None
+            except OSError:
+                # A timeout (or another error) leaves the connection in an unknown state, and the server may still be
+                # working on the request, so sending it again would only add to its load. Give up on the server.
+                self.close()
+                return None
+            if response is not None:
+                return response
+            # The connection was closed or reset, for example because the server was restarted. Reconnect once.
+            self.close()
+        return None
+
+    def unavailable(self):
+        if not self.fallback:
+            raise ConnectionError("The dihash server is not reachable at " + self.socket_path)
+
+    # Same as dihash.hash_indexed_graph with the default string_hash_fun
+    def hash_indexed_graph(self, num_nodes, edges, labels, graph_label=None, hash_nodes=True):
+        response = self.request(wire.encode_hash_request(num_nodes, edges, labels, graph_label, hash_nodes))
+        if response is None:
+            self.unavailable()
+            from .hash_impl import hash_indexed_graph
+            return hash_indexed_graph(num_nodes, edges, labels, graph_label, hash_nodes)
+        return wire.decode_hash_response(response)
+
+    # Same as dihash.hash_graph(g, hash_nodes) for a NetworkX digraph g
+    def hash_graph(self, g, hash_nodes=True):
+        node_list = list(g.nodes)
+        node_to_idx = {n: i for (i, n) in enumerate(node_list)}
+        edges = [(node_to_idx[s], node_to_idx[t]) for (s, t) in g.edges]
+        labels = [g.nodes[n]['label'] for n in node_list]
+        (g_hash, indexed_node_hashes) = self.hash_indexed_graph(len(node_list), edges, labels, g.graph.get('label'), hash_nodes)
+        node_hashes = None
+        if hash_nodes:
+            node_hashes = {n: indexed_node_hashes[i] for (i, n) in enumerate(node_list)}
+        return (g_hash, node_hashes)
+
+    # Returns the metrics of the server as a dictionary (see HashServer.stats), or None if the server is not
+    # reachable
+    def stats(self):
+        response = self.request(wire.OP_STATS)
+        if response is None:
+            self.unavailable()
+            return None
+        return json.loads(wire.decode_stats_response(response))
+
+# Hashes a single graph with a new client, see HashClient.hash_graph
+def hash_graph(g, hash_nodes=True, socket_path=None, timeout=None):
+    with HashClient(socket_path, timeout) as client:
+        return client.hash_graph(g, hash_nodes)
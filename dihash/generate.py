@@ -0,0 +1,156 @@
+import networkx as nx
+import pynauty
+from .hash_impl import indexed_nauty_graph, invert_list, nauty_lock
+
+# Generation of all unlabeled digraphs with a given number of nodes, up to isomorphism, by canonical
+# augmentation. Graphs are built edge by edge. A graph G with e edges is only accepted as a child of its
+# parent P with e-1 edges if the edge that was added is in the same automorphism orbit of G as the last
+# edge of G. Every isomorphism class then has exactly one accepted parent, and adding one representative
+# of each orbit of the non-edges of P makes sure that every class is generated exactly once, without
+# keeping a set of the graphs seen so far. The last edge of G is the edge with the largest degree
+# invariant (see edge_invariant), with ties broken by the canonical order computed by nauty. Most
+# children are rejected by the invariant alone, without calling nauty.
+#
+# Graphs are represented as (num_nodes, edges), where edges is a sorted tuple of (source, target) pairs
+# of node indices 0,...,num_nodes-1. Generated graphs are in the canonical labelling computed by nauty,
+# so two generated graphs are isomorphic if and only if their edge tuples are equal.
+
+# Computes the automorphism group generators of a graph and the canonical position of every node
+def automorphisms(num_nodes, edges):
+    adj_dict = {i: [] for i in range(num_nodes)}
+    for (s, t) in edges:
+        adj_dict[s].append(t)
+    nauty_g = indexed_nauty_graph(num_nodes, adj_dict, [''] * num_nodes)
+    with nauty_lock:
+        (generators, _, _, _, _) = pynauty.autgrp(nauty_g)
+        canon = pynauty.canon_label(nauty_g)
+    return (generators, invert_list(canon))
+
+# Partitions a set of node pairs that is closed under the automorphisms into the orbits of the group
+# generated by generators. Returns a dictionary mapping every pair to a representative of its orbit.
+def pair_orbits(pairs, generators):
+    parent = {p: p for p in pairs}
+    def find(p):
+        while parent[p] != p:
+            parent[p] = parent[parent[p]]
+            p = parent[p]
+        return p
+    for gen in generators:
+        for (s, t) in pairs:
+            a = find((s, t))
+            b = find((gen[s], gen[t]))
+            if a != b:
+                parent[a] = b
+    return {p: find(p) for p in pairs}
+
+# Returns the out-degree and in-degree of every node
+def degrees(num_nodes, edges):
+    out_degrees = [0] * num_nodes
+    in_degrees = [0] * num_nodes
+    for (s, t) in edges:
+        out_degrees[s] += 1
+        in_degrees[t] += 1
+    return (out_degrees, in_degrees)
+
+# An isomorphism invariant of an edge: the out-degree and in-degree of its source and its target
+def edge_invariant(out_degrees, in_degrees, edge):
+    (s, t) = edge
+    return (out_degrees[s], in_degrees[s], out_degrees[t], in_degrees[t])
+
+# Returns the pairs of nodes that may be edges
+def node_pairs(num_nodes, loops):
+    return [(s, t) for s in range(num_nodes) for t in range(num_nodes) if loops or s != t]
+
+# (num_nodes, edges) for each graph = dihash.generate_digraphs(num_nodes, loops=False, res=0, mod=1, split_depth=None)
+#
+# Yields every digraph with num_nodes unlabeled nodes exactly once up to isomorphism, as described above. If loops
+# is True the graphs may have self loops. The graphs are produced lazily, in depth first order of the search tree.
+#
+# The search tree can be split into mod parts that are generated independently, for example in different processes:
+# the subtrees rooted at the graphs with split_depth edges are numbered in the order they are visited, and only the
+# subtrees whose number is res modulo mod are generated. Graphs with fewer edges are generated by part 0. By default
+# split_depth is a third of the number of possible edges.
+def generate_digraphs(num_nodes, loops=False, res=0, mod=1, split_depth=None):
+    pairs = node_pairs(num_nodes, loops)
+    if split_depth is None:
+        split_depth = len(pairs) // 3
+    if not 0 <= res < mod:
+        raise ValueError("res must be in the range 0,...,mod-1")
+    # Number of graphs with split_depth edges visited so far
+    visited = [0]
+
+    # Visits the node of the search tree for the graph with the given edges, where depth is the number of edges
+    def visit(edges, generators, canon_mapping, depth):
+        if depth == split_depth:
+            subtree = visited[0]
+            visited[0] += 1
+            if subtree % mod != res:
+                return
+        if depth >= split_depth or res == 0:
+            yield (num_nodes, tuple(sorted((canon_mapping[s], canon_mapping[t]) for (s, t) in edges)))
+        edge_set = set(edges)
+        non_edges = [p for p in pairs if p not in edge_set]
+        # One representative of each orbit of the non-edges
+        candidates = sorted(set(pair_orbits(non_edges, generators).values()))
+        (out_degrees, in_degrees) = degrees(num_nodes, edges)
+        for e in candidates:
+            child_edges = edges + [e]
+            # Find the edges of the child with the largest invariant, using the degrees of the child
+            (s, t) = e
+            out_degrees[s] += 1
+            in_degrees[t] += 1
+            e_invariant = edge_invariant(out_degrees, in_degrees, e)
+            max_edges = []
+            for p in child_edges:
+                p_invariant = edge_invariant(out_degrees, in_degrees, p)
+                if p_invariant > e_invariant:
+                    max_edges = None
+                    break
+                if p_invariant == e_invariant:
+                    max_edges.append(p)
+            out_degrees[s] -= 1
+            in_degrees[t] -= 1
+            if max_edges is None:
+                continue
+            (child_generators, child_canon_mapping) = automorphisms(num_nodes, child_edges)
+            # Accept the child if e is in the same orbit as the last edge of the child
+            last_edge = max(max_edges, key=lambda p: (child_canon_mapping[p[0]], child_canon_mapping[p[1]]))
+            child_orbits = pair_orbits(child_edges, child_generators)
+            if child_orbits[e] == child_orbits[last_edge]:
+                yield from visit(child_edges, child_generators, child_canon_mapping, depth + 1)
+
+    (generators, canon_mapping) = automorphisms(num_nodes, [])
+    yield from visit([], generators, canon_mapping, 0)
+
+# Worker function for generate_digraphs_parallel. Generates the part of the search tree given by the
+# arguments of generate_digraphs in the tuple task.
+def generate_digraphs_part(task):
+    (num_nodes, loops, res, mod, split_depth) = task
+    return list(generate_digraphs(num_nodes, loops, res, mod, split_depth))
+
+# Yields the same graphs as generate_digraphs(num_nodes, loops), but generates num_parts parts of the search
+# tree in a multiprocessing pool. If pool is None, a pool with the given number of processes is created.
+# The graphs of a part are yielded as soon as the part is finished, so the order of the graphs varies.
+def generate_digraphs_parallel(num_nodes, loops=False, pool=None, processes=None, num_parts=64, split_depth=None):
+    own_pool = pool is None
+    if own_pool:
+        import multiprocessing
+        pool = multiprocessing.Pool(processes)
+    try:
+        tasks = [(num_nodes, loops, res, num_parts, split_depth) for res in range(num_parts)]
+        for graphs in pool.imap_unordered(generate_digraphs_part, tasks):
+            yield from graphs
+    finally:
+        if own_pool:
+            pool.close()
+            pool.join()
+
+# Converts a generated graph to a NetworkX digraph where every node has the given label
+def digraph_to_networkx(graph, label=''):
+    (num_nodes, edges) = graph
+    g = nx.DiGraph()
+    for i in range(num_nodes):
+        g.add_node(i)
+        g.nodes[i]['label'] = label
+    g.add_edges_from(edges)
+    return g
@@ -2,6 +2,24 @@ import hashlib
 import networkx as nx
 import pynauty
 import math
+import os
+import pickle
+import time
+import contextlib
+import threading
+from array import array
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# The hashing functions keep all of their state in local variables, so they can be called from many
+# threads at once. The exception is nauty, which keeps its working storage in static variables. pynauty
+# holds the GIL while it calls nauty, but on free-threaded builds of CPython (run with the GIL disabled)
+# two calls could overlap, so calls into nauty are serialized with nauty_lock. If pynauty was built with
+# thread local storage for nauty, set the environment variable DIHASH_NAUTY_THREAD_SAFE=1 to let nauty
+# calls run in parallel.
+if os.environ.get('DIHASH_NAUTY_THREAD_SAFE') == '1':
+    nauty_lock = contextlib.nullcontext()
+else:
+    nauty_lock = threading.Lock()
 
 # Convert a NetworkX graph to a nauty graph
 # Input should be a NetworkX digraph with node labels represented as strings, stored in the 'label'
@@ -11,14 +29,20 @@ def nauty_graph(g):
     node_to_idx = {n: i for (i, n) in enumerate(g.nodes)}
     # Convert the NetworkX adjacency information to use the node indices
     adj_dict = {node_to_idx[s]: [node_to_idx[t] for t in g.successors(s)] for s in g.nodes}
+    labels = [g.nodes[n]['label'] for n in g.nodes]
 
+    # Return the node to index conversion function and the nauty graph
+    return (node_to_idx, indexed_nauty_graph(g.order(), adj_dict, labels))
+
+# Convert a graph whose nodes are the node indices 0,...,num_nodes-1 to a nauty graph
+# adj_dict maps each node index to a list of the indices of its successors, and labels[i] is the label of node i
+def indexed_nauty_graph(num_nodes, adj_dict, labels):
     # Dictionary mapping node labels to a set of node indices
     colorings_lookup = {}
-    for n in g.nodes:
-        label = g.nodes[n]['label']
+    for (i, label) in enumerate(labels):
         if label not in colorings_lookup:
             colorings_lookup[label] = set()
-        colorings_lookup[label].add(node_to_idx[n])
+        colorings_lookup[label].add(i)
 
     # It turns out that the order of the vertex_coloring passed to nauty is important
     ordered_labels = sorted(colorings_lookup.keys())
@@ -27,14 +51,12 @@ def nauty_graph(g):
     colorings = [colorings_lookup[label] for label in ordered_labels]
 
     # Construct the pynauty graph
-    nauty_g = pynauty.Graph(g.order(), directed=True, adjacency_dict=adj_dict, vertex_coloring=colorings)
-
-    # Return the node to index conversion function and the nauty graph
-    return (node_to_idx, nauty_g)
+    return pynauty.Graph(num_nodes, directed=True, adjacency_dict=adj_dict, vertex_coloring=colorings)
 
 # Returns a list of nodes, ordered in the canonical order
 def canonize(idx_to_node, nauty_g):
-    canon = pynauty.canon_label(nauty_g)
+    with nauty_lock:
+        canon = pynauty.canon_label(nauty_g)
     return [idx_to_node[i] for i in canon]
 
 def escape(s):
@@ -56,7 +78,8 @@ def to_str(data):
 # Returns a list of lists of nodes, each list is an orbit
 def orbits(idx_to_node, nauty_g):
     # orbs gives the orbits of the graph. Two nodes i,j are in the same orbit if and only if orbs[i] == orbs[j]
-    (_, _, _, orbs, num_orbits) = pynauty.autgrp(nauty_g)
+    with nauty_lock:
+        (_, _, _, orbs, num_orbits) = pynauty.autgrp(nauty_g)
 
     # orbits_lookup maps an orbit identifier to a list of nodes in that orbit
     orbits_lookup = {}
@@ -97,7 +120,8 @@ def edge_labeled_digraph_to_digraph(g):
     # g_out due to propogated changes to the created layers. Fortunately
     # we can order our labels.
     edge_layers = sorted(list(edge_labels))
-    num_layers = num_to_bit_counts(len(edge_layers))
+    # A graph without edges still needs one layer to hold its nodes
+    num_layers = max(1, num_to_bit_counts(len(edge_layers)))
     format_str = '{0:0' + str(num_layers) + 'b}'
     edge_layer_to_bits = {label: format_str.format(i + 1) for (i, label) in enumerate(edge_layers)}
     g_out = nx.DiGraph()
@@ -218,6 +242,73 @@ def canonical_orbits_mapping(sorted_orbits):
 def hash_sha256(s):
     return hashlib.sha256(s.encode('utf-8')).hexdigest()
 
+# Approximate number of bytes used per node and per edge by the intermediate structures of
+# the hashing functions. These constants were fitted to tracemalloc peaks measured on CPython 3.11
+# (see benchmark_memory in dihash/benchmark.py) for random digraphs with 10 to 5000 nodes and
+# 1 to 50 edges per node, and rounded up.
+# - GRAPH: a NetworkX copy of a graph, as made by hash_graph_node_set and scc_graph
+# - HASH: the nauty graph, canon_adj_list, the summary string and the node hashes, plus a fixed
+#   overhead that dominates for very small graphs
+# - QUOTIENT: one layer of the quotient_fixpoint computation, including the multigraph
+#   copies and the layered graphs created by edge_labeled_digraph_to_digraph
+# - CONDENSATION: the condensation graph, its node to SCC mapping and the member set of every SCC
+GRAPH_NODE_BYTES = 500
+GRAPH_EDGE_BYTES = 170
+HASH_FIXED_BYTES = 10000
+HASH_NODE_BYTES = 400
+HASH_EDGE_BYTES = 180
+QUOTIENT_NODE_BYTES = 4000
+QUOTIENT_EDGE_BYTES = 1200
+CONDENSATION_NODE_BYTES = 400
+CONDENSATION_SCC_BYTES = 700
+CONDENSATION_EDGE_BYTES = 170
+
+# Raised when the estimated size of the intermediate structures of a hashing function is
+# larger than the memory_budget passed to it
+class MemoryBudgetExceeded(MemoryError):
+    def __init__(self, estimate, memory_budget):
+        super().__init__("Hashing is estimated to need {} bytes, which exceeds the memory budget of {} bytes".format(estimate, memory_budget))
+        self.estimate = estimate
+        self.memory_budget = memory_budget
+
+# Estimate the peak number of bytes allocated by hash_graph for a graph with the given number
+# of nodes and edges. num_layers is the number of layers the quotient computation encodes
+# parallel edges with, see edge_labeled_digraph_to_digraph
+def estimate_hash_memory(num_nodes, num_edges, apply_quotient=False, num_layers=1):
+    estimate = HASH_FIXED_BYTES + num_nodes * HASH_NODE_BYTES + num_edges * HASH_EDGE_BYTES
+    if apply_quotient:
+        estimate += num_layers * (num_nodes * QUOTIENT_NODE_BYTES + num_edges * QUOTIENT_EDGE_BYTES)
+    return estimate
+
+# Estimate the peak number of bytes allocated by hash_graph(g)
+def estimate_memory(g, apply_quotient=False):
+    num_layers = 1
+    if apply_quotient and g.is_multigraph():
+        num_layers = num_to_bit_counts(max_num_multiedges(g))
+    return estimate_hash_memory(g.number_of_nodes(), g.number_of_edges(), apply_quotient, num_layers)
+
+# Estimate the peak number of bytes allocated by merkle_hash_graph(g) once the condensation
+# cond of g has been computed. The SCC subgraph copy is only built when an SCC is hashed, after
+# the SCCs it points to have been hashed, so only the copy of the SCC being hashed is alive at a
+# time. The depth first search in hash_scc holds the member sets of the SCCs on its stack and
+# the node hashes, which are covered by GRAPH_NODE_BYTES for every node of g. With max_workers
+# threads, up to max_workers SCCs are hashed at once and the estimate only covers the largest one.
+def estimate_merkle_memory(g, cond, apply_quotient=False):
+    mapping = cond.graph['mapping']
+    scc_num_edges = {}
+    for (s, t) in g.edges():
+        if mapping[s] == mapping[t]:
+            scc_num_edges[mapping[s]] = scc_num_edges.get(mapping[s], 0) + 1
+    estimate = (g.number_of_nodes() * CONDENSATION_NODE_BYTES + cond.number_of_nodes() * CONDENSATION_SCC_BYTES +
+                cond.number_of_edges() * CONDENSATION_EDGE_BYTES + g.number_of_nodes() * GRAPH_NODE_BYTES)
+    (largest_num_nodes, largest_num_edges) = max([(len(cond.nodes[scc]['members']), scc_num_edges.get(scc, 0)) for scc in cond.nodes], default=(0, 0))
+    estimate += largest_num_nodes * GRAPH_NODE_BYTES + largest_num_edges * GRAPH_EDGE_BYTES
+    return estimate + estimate_hash_memory(largest_num_nodes, largest_num_edges, apply_quotient)
+
+def check_memory_budget(estimate, memory_budget):
+    if memory_budget is not None and estimate > memory_budget:
+        raise MemoryBudgetExceeded(estimate, memory_budget)
+
 # (g_hash, node_hashes) = dihash.hash_graph(g, hash_nodes=True, apply_quotient=False, string_hash_fun=hash_sha256)
 #
 # hash_graph has the following inputs:
@@ -225,11 +316,20 @@ def hash_sha256(s):
 # - hash_nodes: A boolean value. If true, hash_graph also returns a dictionary giving the hashes of all nodes in the graph
 # - apply_quotient: A boolean value. If true, the input graph g is run through the quotient_fixpoint function, which computes (G/Orb)/Orb... prior to hashing the graph.
 # - string_hash_fun: A function which maps strings to a string. The default value, hash_sha256 hashes by using hashlib.sha256 and converting to the result to a hex digest.
+# - memory_budget: An optional number of bytes. If the intermediate structures are estimated to need more memory than this, MemoryBudgetExceeded is raised before any work is done.
+# - return_canonical: A boolean value. If true, hash_graph also returns the canonical labelling computed by nauty, see below. It cannot be combined with apply_quotient.
 #
 # hash_graph has the following outputs:
 # - g_hash: A hex digest of the hash of the entire graph
 # - node_hashes: If hash_nodes is False, this value is None. If hash_nodes is True, this value is a dictionary mapping nodes to their hash hex digests.
-def hash_graph(g, hash_nodes=True, apply_quotient=False, string_hash_fun=hash_sha256):
+# - canonical: Only returned if return_canonical is True. A tuple (canonical_order, orbit_ids) of two arrays of integers, where nodes are
+#   identified by their index in list(g.nodes). canonical_order[k] is the index of the node at position k of the canonical order, and
+#   orbit_ids[i] is the index of the orbit of node i (orbits are numbered by their first position in the canonical order, as in the node hashes).
+def hash_graph(g, hash_nodes=True, apply_quotient=False, string_hash_fun=hash_sha256, memory_budget=None, return_canonical=False):
+    if return_canonical and apply_quotient:
+        raise ValueError("return_canonical cannot be combined with apply_quotient, since the canonical order is computed for the quotient graph")
+    if memory_budget is not None:
+        check_memory_budget(estimate_memory(g, apply_quotient), memory_budget)
     original_graph = g
     original_nodes = frozenset(original_graph.nodes())
     if apply_quotient:
@@ -254,32 +354,108 @@ def hash_graph(g, hash_nodes=True, apply_quotient=False, string_hash_fun=hash_sh
     else:
         # sigma is the identity mapping
         sigma = {n: n for n in g.nodes()}
-    (canonization, orbs) = analyze_graph(g, hash_nodes)
+    node_to_idx = {n: i for (i, n) in enumerate(g.nodes)}
+    labels = [g.nodes[n]['label'] for n in g.nodes]
+    # The adjacency dict is built directly from g and not kept here, so that hash_adjacency can free it
+    result = hash_adjacency(len(labels), indexed_adjacency(g, node_to_idx), labels, g.graph.get('label'), hash_nodes, string_hash_fun, return_canonical)
+    (g_hash, indexed_node_hashes) = result[:2]
+    node_hashes = None
+    if hash_nodes:
+        node_hashes = {n: indexed_node_hashes[node_to_idx[sigma[n]]] for n in original_nodes}
+    if return_canonical:
+        return (g_hash, node_hashes, result[2])
+    return (g_hash, node_hashes)
+
+# (g_hash, node_hashes) = dihash.hash_indexed_graph(num_nodes, edges, labels, graph_label=None, hash_nodes=True, string_hash_fun=hash_sha256, return_canonical=False)
+#
+# Computes the same hashes as hash_graph (with apply_quotient=False) for a graph given as plain lists instead
+# of a NetworkX digraph. The nodes are the indices 0,...,num_nodes-1, edges is a list of (source, target) index
+# pairs without duplicates, labels[i] is the label of node i and graph_label is the optional label of the
+# entire graph. If hash_nodes is True, node_hashes is a list where element i is the hash of node i.
+# If return_canonical is True, the canonical labelling (canonical_order, orbit_ids) described in hash_graph is
+# returned as a third element.
+def hash_indexed_graph(num_nodes, edges, labels, graph_label=None, hash_nodes=True, string_hash_fun=hash_sha256, return_canonical=False):
+    return hash_adjacency(num_nodes, edges_adjacency(num_nodes, edges), labels, graph_label, hash_nodes, string_hash_fun, return_canonical)
+
+# Returns a dictionary mapping each node index to a list of the indices of its successors
+def edges_adjacency(num_nodes, edges):
+    adj_dict = {i: [] for i in range(num_nodes)}
+    for (s, t) in edges:
+        adj_dict[s].append(t)
+    return adj_dict
+
+# Returns a dictionary mapping the index of each node of g to a list of the indices of its successors
+def indexed_adjacency(g, node_to_idx):
+    return {node_to_idx[s]: [node_to_idx[t] for t in g.successors(s)] for s in g.nodes}
+
+# The hashing core shared by hash_graph and hash_indexed_graph. The graph is given by the adjacency dict that
+# is passed to nauty, where adj_dict maps each node index to a list of the indices of its successors. Callers
+# should not keep a reference to adj_dict, so that it can be freed before the summary string is built.
+def hash_adjacency(num_nodes, adj_dict, labels, graph_label, hash_nodes, string_hash_fun, return_canonical):
+    nauty_g = indexed_nauty_graph(num_nodes, adj_dict, labels)
+    # canonization[i] is the index of the node at position i of the canonical order
+    canonization = canonize(range(num_nodes), nauty_g)
     canon_mapping = invert_list(canonization)
-    canon_adj_list = sorted([(canon_mapping[s], canon_mapping[t]) for (s, t) in g.edges])
-    canon_labels = [g.nodes[n]['label'] for n in canonization]
-    if 'label' in g.graph:
-        g_summary = (g.graph['label'], canon_labels, canon_adj_list)
+    node_orbits = None
+    if hash_nodes or return_canonical:
+        node_orbits = orbits(range(num_nodes), nauty_g)
+    canon_adj_list = sorted((canon_mapping[s], canon_mapping[t]) for (s, successors) in adj_dict.items() for t in successors)
+    # The nauty graph and the adjacency dict are no longer needed, free them before building the summary
+    del nauty_g
+    del adj_dict
+    canon_labels = [labels[i] for i in canonization]
+    if graph_label is not None:
+        g_summary = (graph_label, canon_labels, canon_adj_list)
     else:
         g_summary = (canon_labels, canon_adj_list)
     g_hash = string_hash_fun(to_str(g_summary))
+    del g_summary
+    del canon_adj_list
     node_hashes = None
-    if hash_nodes:
-        ordered_orbits = sort_orbits(canon_mapping, orbs)
+    orbit_ids = None
+    if node_orbits is not None:
+        ordered_orbits = sort_orbits(canon_mapping, node_orbits)
         # Note that this indexing scheme departs slightly from the paper. Instead of mapping from nodes to the minimum
         # node index in the same orbit, we map from nodes to the index of the orbit, where the index of the orbit
         # is computed based on its order of appearance in ordered_orbits.
-        canon_orbits_mapping = canonical_orbits_mapping(ordered_orbits)
-        node_hashes = {}
-        for n in original_nodes:
-            quotient_node = sigma[n]
-            node_hashes[n] = string_hash_fun(to_str((canon_orbits_mapping[quotient_node], g_hash)))
+        orbit_ids = array('l', [0]) * num_nodes
+        for (orbit_i, orb) in enumerate(ordered_orbits):
+            for i in orb:
+                orbit_ids[i] = orbit_i
+    if hash_nodes:
+        orbit_hashes = [string_hash_fun(to_str((orbit_i, g_hash))) for orbit_i in range(len(ordered_orbits))]
+        node_hashes = [orbit_hashes[orbit_i] for orbit_i in orbit_ids]
+    if return_canonical:
+        return (g_hash, node_hashes, (array('l', canonization), orbit_ids))
     return (g_hash, node_hashes)
 
+# mapping = dihash.isomorphism(g1, res1, g2, res2)
+#
+# Returns an isomorphism from g1 to g2 as a dictionary mapping the nodes of g1 to the nodes of g2, or None if the
+# graphs are not isomorphic. res1 and res2 are the results of hash_graph(g, return_canonical=True) for g1 and g2,
+# computed with the same string_hash_fun, and the graphs must not have been modified since. The results of
+# hash_tree(g, return_canonical=True) can be used as well, as long as both results come from hash_tree. The mapping pairs up
+# the nodes at the same position of the two canonical orders, so no search is needed.
+def isomorphism(g1, res1, g2, res2):
+    if len(res1) != 3 or len(res2) != 3:
+        raise ValueError("isomorphism needs the results of hash_graph(g, return_canonical=True) or hash_tree(g, return_canonical=True)")
+    if res1[0] != res2[0]:
+        return None
+    (order1, _) = res1[2]
+    (order2, _) = res2[2]
+    nodes1 = list(g1.nodes)
+    nodes2 = list(g2.nodes)
+    if len(order1) != len(nodes1) or len(order2) != len(nodes2):
+        raise ValueError("The graphs have been modified since they were hashed")
+    return {nodes1[i]: nodes2[j] for (i, j) in zip(order1, order2)}
+
 # Compute the hashes of nodes in a graph where we have pointers to all the nodes in the node_set
 # This is in contrast to the node_hashes in the hash_graph function, where we are assuming
 # that we only want the hashes of one pointer into the graph
-def hash_graph_node_set(g, node_set, apply_quotient=False, string_hash_fun=hash_sha256):
+def hash_graph_node_set(g, node_set, apply_quotient=False, string_hash_fun=hash_sha256, memory_budget=None):
+    if memory_budget is not None:
+        copy_estimate = g.number_of_nodes() * GRAPH_NODE_BYTES + g.number_of_edges() * GRAPH_EDGE_BYTES
+        check_memory_budget(copy_estimate + estimate_memory(g, apply_quotient), memory_budget)
     # Copy the graph because we're going to need to mutate it
     g = g.copy()
     if len(node_set) >= 2:
@@ -293,40 +469,242 @@ def hash_graph_node_set(g, node_set, apply_quotient=False, string_hash_fun=hash_
     node_hashes = {n : node_hashes[n] for n in node_set}
     return (g_hash, node_hashes)
 
-def hash_scc(g, cond, scc, scc_hashes, node_hashes, apply_quotient, string_hash_fun):
-    if scc in scc_hashes:
-        return
-
-    scc_members = frozenset(cond.nodes[scc]['members'])
-
-    scc_graph = g.subgraph(scc_members).copy()
-
+# Hash a list of graphs with a thread pool of max_workers threads (by default, the ThreadPoolExecutor default)
+# Returns a list with the result of hash_graph for every graph, in order.
+# Threads only run in parallel on free-threaded builds of CPython, see nauty_lock.
+def hash_graphs_threaded(graphs, max_workers=None, hash_nodes=True, apply_quotient=False, string_hash_fun=hash_sha256):
+    def hash_one(g):
+        return hash_graph(g, hash_nodes=hash_nodes, apply_quotient=apply_quotient, string_hash_fun=string_hash_fun)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(hash_one, graphs))
+
+# Builds the graph that is hashed for an SCC by hash_scc: the subgraph of g induced by scc_members, where
+# the label of each node is replaced by the hash of its label and the hashes of its successors outside of
+# the SCC. All of these successors must already have a hash in node_hashes.
+def scc_graph(g, scc_members, node_hashes, string_hash_fun=hash_sha256):
+    graph = g.subgraph(scc_members).copy()
     for s in scc_members:
-        non_scc_succs = frozenset(g.successors(s)) - scc_members
-        # Recursively hash all nodes that are the target of an edge from within the scc to outside the scc
-        for t in non_scc_succs:
-            if t not in node_hashes:
-                t_scc = cond.graph['mapping'][t]
-                hash_scc(g, cond, t_scc, scc_hashes, node_hashes, apply_quotient, string_hash_fun)
-        non_scc_succs_hashes = sorted([node_hashes[t] for t in non_scc_succs])
-        scc_graph.nodes[s]['label'] = string_hash_fun(to_str((g.nodes[s]['label'], non_scc_succs_hashes)))
-
-    (scc_hash, scc_node_hashes) = hash_graph(scc_graph, hash_nodes=True, apply_quotient=apply_quotient, string_hash_fun=string_hash_fun)
-
-    scc_hashes[scc] = scc_hash
-    node_hashes.update(scc_node_hashes)
-
-def merkle_hash_graph(g, nodes_to_hash=None, apply_quotient=False, precomputed_hashes=None, string_hash_fun=hash_sha256):
+        non_scc_succs_hashes = sorted([node_hashes[t] for t in g.successors(s) if t not in scc_members])
+        graph.nodes[s]['label'] = string_hash_fun(to_str((g.nodes[s]['label'], non_scc_succs_hashes)))
+    return graph
+
+# on_scc_hashed is an optional function that is called as on_scc_hashed(scc, scc_members, scc_hash, scc_node_hashes)
+# every time an SCC has been hashed
+def hash_scc(g, cond, scc, scc_hashes, node_hashes, apply_quotient, string_hash_fun, on_scc_hashed=None):
+    # Yields the SCCs of the nodes that are the target of an edge from within the scc to outside the scc, and
+    # that do not have a hash yet
+    def unhashed_successor_sccs(scc_members):
+        for s in scc_members:
+            for t in g.successors(s):
+                if t not in scc_members and t not in node_hashes:
+                    yield cond.graph['mapping'][t]
+
+    # Hash the SCCs in depth first order with an explicit stack instead of recursion, so that long chains of
+    # SCCs (such as deep trees) do not exceed the recursion limit. Every entry of the stack is an SCC, its
+    # members and the generator of its successor SCCs, which are hashed before the SCC itself.
+    stack = [(scc, None, None)]
+    while stack:
+        (scc, scc_members, successor_sccs) = stack[-1]
+        if scc_members is None:
+            if scc in scc_hashes:
+                stack.pop()
+                continue
+            scc_members = frozenset(cond.nodes[scc]['members'])
+            successor_sccs = unhashed_successor_sccs(scc_members)
+            stack[-1] = (scc, scc_members, successor_sccs)
+        t_scc = next(successor_sccs, None)
+        if t_scc is not None:
+            stack.append((t_scc, None, None))
+            continue
+        stack.pop()
+
+        (scc_hash, scc_node_hashes) = hash_graph(scc_graph(g, scc_members, node_hashes, string_hash_fun), hash_nodes=True, apply_quotient=apply_quotient, string_hash_fun=string_hash_fun)
+
+        scc_hashes[scc] = scc_hash
+        node_hashes.update(scc_node_hashes)
+        if on_scc_hashed is not None:
+            on_scc_hashed(scc, scc_members, scc_hash, scc_node_hashes)
+
+# Hashes the SCCs reachable from roots with a pool of max_workers threads, with the same result as calling
+# hash_scc on every root. An SCC is submitted to the pool once all of the SCCs it depends on have been hashed.
+# The worker threads only read g, cond and the hashes of completed SCCs. scc_hashes and node_hashes are
+# only updated (and on_scc_hashed is only called) by the calling thread.
+def hash_sccs_threaded(g, cond, roots, scc_hashes, node_hashes, apply_quotient, string_hash_fun, on_scc_hashed=None, max_workers=None):
+    # Find the SCCs that need to be hashed, and the SCCs that each of them depends on
+    dependencies = {}
+    stack = [r for r in roots if r not in scc_hashes]
+    while stack:
+        scc = stack.pop()
+        if scc in dependencies:
+            continue
+        scc_members = cond.nodes[scc]['members']
+        scc_dependencies = set()
+        for s in scc_members:
+            for t in g.successors(s):
+                if t not in scc_members and t not in node_hashes:
+                    scc_dependencies.add(cond.graph['mapping'][t])
+        dependencies[scc] = scc_dependencies
+        stack.extend(scc_dependencies)
+
+    dependents = {scc: [] for scc in dependencies}
+    num_waiting = {}
+    for (scc, scc_dependencies) in dependencies.items():
+        num_waiting[scc] = len(scc_dependencies)
+        for d in scc_dependencies:
+            dependents[d].append(scc)
+
+    def hash_one(scc):
+        scc_members = frozenset(cond.nodes[scc]['members'])
+        return (scc_members, hash_graph(scc_graph(g, scc_members, node_hashes, string_hash_fun), hash_nodes=True, apply_quotient=apply_quotient, string_hash_fun=string_hash_fun))
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        running = {executor.submit(hash_one, scc): scc for (scc, n) in num_waiting.items() if n == 0}
+        while running:
+            (done, _) = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                scc = running.pop(future)
+                (scc_members, (scc_hash, scc_node_hashes)) = future.result()
+                scc_hashes[scc] = scc_hash
+                node_hashes.update(scc_node_hashes)
+                if on_scc_hashed is not None:
+                    on_scc_hashed(scc, scc_members, scc_hash, scc_node_hashes)
+                for d in dependents[scc]:
+                    num_waiting[d] -= 1
+                    if num_waiting[d] == 0:
+                        running[executor.submit(hash_one, d)] = d
+
+# Returns the set of nodes of cond that are reachable from the nodes in roots (including the roots), with a
+# single traversal that visits every node at most once
+def reachable_sccs(cond, roots):
+    reached = set(roots)
+    stack = list(reached)
+    while stack:
+        for t in cond.successors(stack.pop()):
+            if t not in reached:
+                reached.add(t)
+                stack.append(t)
+    return reached
+
+CHECKPOINT_VERSION = 1
+
+# The first record of a checkpoint file. It is used to check that a checkpoint belongs to the graph being hashed.
+def checkpoint_header(g, apply_quotient):
+    return ('dihash merkle checkpoint', CHECKPOINT_VERSION, g.number_of_nodes(), g.number_of_edges(), apply_quotient)
+
+# A checkpoint file written by merkle_hash_graph starts with a pickled header, followed by one pickled
+# (scc_members, scc_hash, scc_node_hashes) record per hashed SCC. Returns the list of records and the length
+# of the file up to the end of the last complete record. A record that was only partially written when the
+# job was killed is ignored. If header is not None, a ValueError is raised if the file has a different header.
+def read_checkpoint(path, header=None):
+    records = []
+    valid_length = 0
+    with open(path, 'rb') as f:
+        try:
+            file_header = pickle.load(f)
+        except (EOFError, pickle.UnpicklingError):
+            return (records, valid_length)
+        if header is not None and file_header != header:
+            raise ValueError("Checkpoint {} was written for a different graph or with different options".format(path))
+        valid_length = f.tell()
+        while True:
+            try:
+                records.append(pickle.load(f))
+            except (EOFError, pickle.UnpicklingError):
+                break
+            valid_length = f.tell()
+    return (records, valid_length)
+
+# Opens a checkpoint file for appending records. An existing checkpoint must have the same header,
+# and a partially written record at its end is discarded.
+def open_checkpoint(path, header):
+    valid_length = 0
+    if os.path.exists(path):
+        (_, valid_length) = read_checkpoint(path, header)
+    if valid_length == 0:
+        f = open(path, 'wb')
+        pickle.dump(header, f)
+    else:
+        f = open(path, 'r+b')
+        f.truncate(valid_length)
+        f.seek(valid_length)
+    return f
+
+def write_checkpoint_records(f, records):
+    for record in records:
+        pickle.dump(record, f)
+    f.flush()
+    os.fsync(f.fileno())
+
+# (scc_hashes, cond, node_hashes) = dihash.merkle_hash_graph(g, nodes_to_hash=None, apply_quotient=False, precomputed_hashes=None, string_hash_fun=hash_sha256, memory_budget=None, checkpoint=None, checkpoint_interval=100, resume_from=None, progress=None, max_workers=None)
+#
+# Long running jobs can be checkpointed with the following inputs:
+# - checkpoint: An optional path of a file that the hashes of the completed SCCs are appended to, every checkpoint_interval SCCs and when the function returns or raises.
+# - resume_from: An optional path of a checkpoint written by an earlier call on the same graph, with the same apply_quotient and string_hash_fun. The SCCs in the checkpoint are not hashed again. resume_from may be the same path as checkpoint, otherwise the resumed records are copied into checkpoint. Checkpoints are pickle files, so only resume from trusted files.
+# - progress: An optional function that is called as progress(num_sccs_done, num_sccs_total, sccs_per_second) every time an SCC has been hashed. num_sccs_total counts the SCCs reachable from the nodes being hashed, and sccs_per_second only counts the SCCs hashed by this call.
+#
+# If max_workers is not None, the SCCs are hashed by a pool of max_workers threads, see hash_sccs_threaded.
+def merkle_hash_graph(g, nodes_to_hash=None, apply_quotient=False, precomputed_hashes=None, string_hash_fun=hash_sha256, memory_budget=None,
+                      checkpoint=None, checkpoint_interval=100, resume_from=None, progress=None, max_workers=None):
     if precomputed_hashes is None:
         node_hashes = {}
     else:
         node_hashes = precomputed_hashes.copy()
     scc_hashes = {}
     cond = nx.algorithms.components.condensation(g)
+    if memory_budget is not None:
+        check_memory_budget(estimate_merkle_memory(g, cond, apply_quotient), memory_budget)
     if nodes_to_hash is None:
         roots = {n for (n, d) in cond.in_degree() if d == 0}
     else:
         roots = {cond.graph['mapping'][n] for n in nodes_to_hash}
-    for r in roots:
-        hash_scc(g, cond, r, scc_hashes, node_hashes, apply_quotient, string_hash_fun)
-    return (scc_hashes, cond, node_hashes)
\ No newline at end of file
+
+    header = checkpoint_header(g, apply_quotient)
+    resumed_records = []
+    if resume_from is not None and os.path.exists(resume_from):
+        (resumed_records, _) = read_checkpoint(resume_from, header)
+        for (scc_members, scc_hash, scc_node_hashes) in resumed_records:
+            scc = cond.graph['mapping'][next(iter(scc_members))]
+            if frozenset(cond.nodes[scc]['members']) != scc_members:
+                raise ValueError("Checkpoint {} does not match the SCCs of the graph".format(resume_from))
+            scc_hashes[scc] = scc_hash
+            node_hashes.update(scc_node_hashes)
+
+    on_scc_hashed = None
+    checkpoint_file = None
+    pending_records = []
+    if checkpoint is not None or progress is not None:
+        if nodes_to_hash is None:
+            num_sccs_total = cond.number_of_nodes()
+        else:
+            num_sccs_total = len(reachable_sccs(cond, roots))
+        num_sccs_resumed = len(scc_hashes)
+        start_time = time.monotonic()
+        if checkpoint is not None:
+            # When resuming from a different file, copy the resumed records so that the new checkpoint is complete
+            resumed_elsewhere = resumed_records and not (os.path.exists(checkpoint) and os.path.samefile(checkpoint, resume_from))
+            checkpoint_file = open_checkpoint(checkpoint, header)
+            if resumed_elsewhere:
+                write_checkpoint_records(checkpoint_file, resumed_records)
+
+        def on_scc_hashed(scc, scc_members, scc_hash, scc_node_hashes):
+            if checkpoint_file is not None:
+                pending_records.append((scc_members, scc_hash, scc_node_hashes))
+                if len(pending_records) >= checkpoint_interval:
+                    write_checkpoint_records(checkpoint_file, pending_records)
+                    pending_records.clear()
+            if progress is not None:
+                elapsed = time.monotonic() - start_time
+                num_sccs_hashed = len(scc_hashes) - num_sccs_resumed
+                progress(len(scc_hashes), num_sccs_total, num_sccs_hashed / elapsed if elapsed > 0 else 0.0)
+
+    try:
+        if max_workers is None:
+            for r in roots:
+                hash_scc(g, cond, r, scc_hashes, node_hashes, apply_quotient, string_hash_fun, on_scc_hashed)
+        else:
+            hash_sccs_threaded(g, cond, roots, scc_hashes, node_hashes, apply_quotient, string_hash_fun, on_scc_hashed, max_workers)
+    finally:
+        if checkpoint_file is not None:
+            write_checkpoint_records(checkpoint_file, pending_records)
+            checkpoint_file.close()
+    return (scc_hashes, cond, node_hashes)
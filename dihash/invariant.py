@@ -0,0 +1,164 @@
+import functools
+import hashlib
+from array import array
+import numpy as np
+from .hash_impl import to_str, hash_sha256, hash_graph
+
+# A cheap isomorphism invariant for node labeled digraphs, and a deduplication helper that
+# uses it to avoid running nauty on graphs that are certainly unique.
+#
+# Isomorphic graphs (with identical node and graph labels) always have the same invariant,
+# so two graphs can only have the same hash_graph hash if their invariants collide.
+
+# Multiplicative constants of the splitmix64 finalizer
+MIX_MULTIPLIER_1 = np.uint64(0xbf58476d1ce4e5b9)
+MIX_MULTIPLIER_2 = np.uint64(0x94d049bb133111eb)
+# Odd constants used to combine a node color with the colors of its neighborhood
+OUT_NEIGHBOR_MULTIPLIER = np.uint64(0x9e3779b97f4a7c15)
+IN_NEIGHBOR_MULTIPLIER = np.uint64(0xc2b2ae3d27d4eb4f)
+
+# The same constants as Python integers, for graphs that are refined without NumPy
+UINT64_MASK = (1 << 64) - 1
+MIX_MULTIPLIER_1_INT = int(MIX_MULTIPLIER_1)
+MIX_MULTIPLIER_2_INT = int(MIX_MULTIPLIER_2)
+OUT_NEIGHBOR_MULTIPLIER_INT = int(OUT_NEIGHBOR_MULTIPLIER)
+IN_NEIGHBOR_MULTIPLIER_INT = int(IN_NEIGHBOR_MULTIPLIER)
+
+# Graphs with fewer nodes plus edges than this are refined with Python integers instead of NumPy
+# arrays. Both give the same invariant, but for small graphs the fixed cost of the NumPy calls
+# dominates (see benchmark_quick_invariant in dihash/benchmark.py).
+SMALL_GRAPH_SIZE = 60
+
+# Scramble the bits of an array of uint64 values
+def mix(x):
+    x = x ^ (x >> np.uint64(30))
+    x = x * MIX_MULTIPLIER_1
+    x = x ^ (x >> np.uint64(27))
+    x = x * MIX_MULTIPLIER_2
+    return x ^ (x >> np.uint64(31))
+
+# Same as mix for a single Python integer in the range of a uint64
+def mix_int(x):
+    x ^= x >> 30
+    x = (x * MIX_MULTIPLIER_1_INT) & UINT64_MASK
+    x ^= x >> 27
+    x = (x * MIX_MULTIPLIER_2_INT) & UINT64_MASK
+    return x ^ (x >> 31)
+
+# Map a string label to a uint64 that is stable across processes (unlike the builtin hash). The
+# codes are cached, since the same labels usually appear in many graphs.
+@functools.lru_cache(maxsize=65536)
+def label_code(label):
+    return int.from_bytes(hashlib.sha256(to_str(label).encode('utf-8')).digest()[:8], 'little')
+
+# Converts a NetworkX digraph to lists: the label code of every node and the source and target
+# index of every edge. Nodes are indexed in the order of g.nodes.
+def graph_lists(g):
+    node_to_idx = {n: i for (i, n) in enumerate(g.nodes)}
+    labels = [label_code(attributes['label']) for (_, attributes) in g.nodes(data=True)]
+    sources = []
+    targets = []
+    for (s, successors) in g.adjacency():
+        s_idx = node_to_idx[s]
+        for t in successors:
+            sources.append(s_idx)
+            targets.append(node_to_idx[t])
+    return (labels, sources, targets)
+
+# Returns the sorted in-degree and out-degree distributions and the sorted colors of num_rounds
+# rounds of color refinement as byte strings, computed with NumPy
+def refinement_summary(labels, sources, targets, num_rounds):
+    num_nodes = len(labels)
+    sources = np.array(sources, dtype=np.int64)
+    targets = np.array(targets, dtype=np.int64)
+    parts = [np.sort(np.bincount(sources, minlength=num_nodes)).tobytes(),
+             np.sort(np.bincount(targets, minlength=num_nodes)).tobytes()]
+    colors = np.array(labels, dtype=np.uint64)
+    for _ in range(num_rounds):
+        neighbor_colors = mix(colors)
+        out_sums = np.zeros(num_nodes, dtype=np.uint64)
+        np.add.at(out_sums, sources, neighbor_colors[targets])
+        in_sums = np.zeros(num_nodes, dtype=np.uint64)
+        np.add.at(in_sums, targets, neighbor_colors[sources])
+        colors = mix(colors + out_sums * OUT_NEIGHBOR_MULTIPLIER + in_sums * IN_NEIGHBOR_MULTIPLIER)
+        parts.append(np.sort(colors).tobytes())
+    return parts
+
+# Same as refinement_summary, computed with Python integers
+def refinement_summary_small(labels, sources, targets, num_rounds):
+    num_nodes = len(labels)
+    out_degrees = [0] * num_nodes
+    in_degrees = [0] * num_nodes
+    for (s, t) in zip(sources, targets):
+        out_degrees[s] += 1
+        in_degrees[t] += 1
+    parts = [array('q', sorted(out_degrees)).tobytes(), array('q', sorted(in_degrees)).tobytes()]
+    colors = labels
+    for _ in range(num_rounds):
+        neighbor_colors = [mix_int(c) for c in colors]
+        out_sums = [0] * num_nodes
+        in_sums = [0] * num_nodes
+        for (s, t) in zip(sources, targets):
+            out_sums[s] += neighbor_colors[t]
+            in_sums[t] += neighbor_colors[s]
+        colors = [mix_int((c + o * OUT_NEIGHBOR_MULTIPLIER_INT + i * IN_NEIGHBOR_MULTIPLIER_INT) & UINT64_MASK)
+                  for (c, o, i) in zip(colors, out_sums, in_sums)]
+        parts.append(array('Q', sorted(colors)).tobytes())
+    return parts
+
+# Computes an isomorphism invariant of a NetworkX digraph with string node labels, returned
+# as a hex digest. The invariant summarizes the graph label, the node label histogram, the
+# in-degree and out-degree distributions, the number of self loops and the color histograms
+# of num_rounds rounds of Weisfeiler-Leman color refinement, where a node's new color combines
+# its color with the colors of its in-neighbors and out-neighbors.
+def quick_invariant(g, num_rounds=3):
+    (labels, sources, targets) = graph_lists(g)
+    num_nodes = len(labels)
+    num_edges = len(sources)
+    summary = hashlib.sha256()
+    if 'label' in g.graph:
+        summary.update(to_str(('graph_label', g.graph['label'])).encode('utf-8'))
+    num_self_loops = sum(1 for (s, t) in zip(sources, targets) if s == t)
+    summary.update(array('q', [num_nodes, num_edges, num_self_loops]).tobytes())
+    summary.update(array('Q', sorted(labels)).tobytes())
+    if num_nodes + num_edges < SMALL_GRAPH_SIZE:
+        parts = refinement_summary_small(labels, sources, targets, num_rounds)
+    else:
+        parts = refinement_summary(labels, sources, targets, num_rounds)
+    for part in parts:
+        summary.update(part)
+    return summary.hexdigest()
+
+# Graphs with fewer nodes plus edges than this are hashed directly by dedup_graphs. Small graphs
+# are cheap to hash, and lists of them tend to contain many duplicates whose invariants collide,
+# so computing the invariant first would only add to the cost.
+DEDUP_DIRECT_HASH_SIZE = 40
+
+# Finds the duplicate graphs in a list of graphs. Returns a list where element i is the index
+# of the first graph that has the same hash_graph hash as graphs[i] (so unique graphs map to
+# themselves). The result is identical to grouping the graphs by
+# hash_graph(g, hash_nodes=False, string_hash_fun=string_hash_fun), but hash_graph is only
+# called on small graphs and on graphs whose quick_invariant collides with that of another graph.
+#
+# Note that apply_quotient is not supported, since graphs of different sizes can have the
+# same quotient.
+def dedup_graphs(graphs, string_hash_fun=hash_sha256, num_rounds=3):
+    graphs = list(graphs)
+    # Whether a graph is small only depends on its size, so isomorphic graphs are either both
+    # hashed directly or both summarized by their invariant
+    invariants = [None if g.number_of_nodes() + g.number_of_edges() < DEDUP_DIRECT_HASH_SIZE
+                  else quick_invariant(g, num_rounds) for g in graphs]
+    invariant_counts = {}
+    for inv in invariants:
+        invariant_counts[inv] = invariant_counts.get(inv, 0) + 1
+    first_index = {}
+    representatives = []
+    for (i, (g, inv)) in enumerate(zip(graphs, invariants)):
+        if inv is not None and invariant_counts[inv] == 1:
+            representatives.append(i)
+            continue
+        (g_hash, _) = hash_graph(g, hash_nodes=False, string_hash_fun=string_hash_fun)
+        if g_hash not in first_index:
+            first_index[g_hash] = i
+        representatives.append(first_index[g_hash])
+    return representatives
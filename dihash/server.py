@@ -0,0 +1,260 @@
+import argparse
+import hashlib
+import json
+import os
+import signal
+import socket
+import socketserver
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from . import wire
+
+# A long running hashing server on a Unix socket, started with the dihash-server command.
+#
+# Short lived processes that hash a few graphs spend most of their time importing NetworkX and
+# pynauty. The server keeps a pool of worker processes with these modules already imported, and
+# clients (see dihash/client.py) send graphs in the compact indexed form of dihash/wire.py. Requests
+# for identical graphs are answered from a shared LRU cache, and identical requests that arrive while
+# the first one is still being hashed wait for its result instead of being hashed again. Requests are
+# identified by their encoded bytes, so isomorphic graphs given with different node orders are
+# separate cache entries (but of course receive the same g_hash). All hashes are computed with
+# hash_sha256.
+
+# Initializer of the worker processes, imports the hashing code before the first request arrives
+def warm_worker():
+    from . import hash_impl
+
+# Hashes an encoded hash request with hash_indexed_graph and returns the encoded response. This runs in
+# the worker processes, so it has to be a module level function.
+def hash_request(body):
+    from .hash_impl import hash_indexed_graph
+    try:
+        (num_nodes, edges, labels, graph_label, hash_nodes) = wire.decode_hash_request(body)
+        (g_hash, node_hashes) = hash_indexed_graph(num_nodes, edges, labels, graph_label, hash_nodes)
+    except (ValueError, TypeError, UnicodeDecodeError) as e:
+        return wire.encode_error("Unable to hash graph: {}".format(e))
+    return wire.encode_hash_response(g_hash, node_hashes)
+
+# Summarizes a list of durations in seconds as milliseconds
+def latency_summary(durations):
+    durations = sorted(durations)
+    if not durations:
+        return {'count': 0}
+    def percentile(p):
+        return 1000 * durations[min(len(durations) - 1, int(p * len(durations)))]
+    return {
+        'count': len(durations),
+        'mean': 1000 * sum(durations) / len(durations),
+        'p50': percentile(0.5),
+        'p90': percentile(0.9),
+        'p99': percentile(0.99),
+        'max': 1000 * durations[-1],
+    }
+
+# Serves one client connection, answering requests until the client disconnects
+class HashRequestHandler(socketserver.BaseRequestHandler):
+    def setup(self):
+        with self.server.lock:
+            self.server.connections.add(self.request)
+
+    def finish(self):
+        with self.server.lock:
+            self.server.connections.discard(self.request)
+
+    def handle(self):
+        while True:
+            try:
+                body = wire.recv_message(self.request)
+            except (OSError, ValueError):
+                return
+            if body is None:
+                return
+            response = self.server.respond(body)
+            try:
+                wire.send_message(self.request, response)
+            except OSError:
+                return
+
+# server = dihash.HashServer(socket_path=None, processes=None, cache_size=100000, latency_window=10000)
+#
+# - socket_path: the Unix socket to listen on, by default wire.default_socket_path()
+# - processes: the number of worker processes, by default one per CPU. If 0, graphs are hashed in the
+#   connection threads of the server process instead.
+# - cache_size: the maximum number of results kept in the LRU cache
+# - latency_window: the number of most recent requests that the latency percentiles are computed from
+#
+# Call server.serve_forever() to serve requests, and server.shutdown() from another thread to stop.
+# server.server_close() closes the client connections, stops the worker processes and removes the socket.
+class HashServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path=None, processes=None, cache_size=100000, latency_window=10000):
+        if socket_path is None:
+            socket_path = wire.default_socket_path()
+            if not os.environ.get('DIHASH_SOCKET'):
+                wire.make_private_dir(os.path.dirname(socket_path))
+        self.socket_path = socket_path
+        remove_stale_socket(socket_path)
+        self.pool = None
+        if processes != 0:
+            import multiprocessing
+            self.pool = multiprocessing.Pool(processes, initializer=warm_worker)
+        else:
+            warm_worker()
+        self.cache_size = cache_size
+        # Maps the sha256 digest of a request to its response, in least recently used order
+        self.cache = OrderedDict()
+        # Maps the digest of a request that is being hashed to a Future of its response
+        self.in_flight = {}
+        self.lock = threading.Lock()
+        # The sockets of the open client connections
+        self.connections = set()
+        self.start_time = time.monotonic()
+        self.counts = {'requests': 0, 'hash_requests': 0, 'cache_hits': 0, 'coalesced': 0, 'hashed': 0, 'errors': 0}
+        # Durations of the most recent requests, from receiving the request to having the response
+        self.latencies = deque(maxlen=latency_window)
+        # Durations of the most recent hash computations in the worker processes
+        self.hash_times = deque(maxlen=latency_window)
+        try:
+            super().__init__(socket_path, HashRequestHandler)
+        except Exception:
+            self.close_pool()
+            raise
+
+    def close_pool(self):
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
+
+    def server_close(self):
+        super().server_close()
+        # Close the open connections, so their clients notice that the server stopped
+        with self.lock:
+            connections = list(self.connections)
+        for sock in connections:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        self.close_pool()
+        try:
+            os.unlink(self.socket_path)
+        except FileNotFoundError:
+            pass
+
+    def respond(self, body):
+        start = time.monotonic()
+        if body[:1] == wire.OP_HASH:
+            response = self.hash_response(body)
+        elif body[:1] == wire.OP_STATS:
+            response = wire.encode_stats_response(json.dumps(self.stats()))
+        else:
+            response = wire.encode_error("Unknown operation")
+        with self.lock:
+            self.counts['requests'] += 1
+            if response[0] == wire.STATUS_ERROR:
+                self.counts['errors'] += 1
+            self.latencies.append(time.monotonic() - start)
+        return response
+
+    # Returns the response to a hash request, from the cache, from an identical request that is in flight
+    # or by hashing it in a worker process
+    def hash_response(self, body):
+        key = hashlib.sha256(body).digest()
+        with self.lock:
+            self.counts['hash_requests'] += 1
+            response = self.cache.get(key)
+            if response is not None:
+                self.cache.move_to_end(key)
+                self.counts['cache_hits'] += 1
+                return response
+            future = self.in_flight.get(key)
+            if future is not None:
+                self.counts['coalesced'] += 1
+                is_owner = False
+            else:
+                future = Future()
+                self.in_flight[key] = future
+                is_owner = True
+        if not is_owner:
+            return future.result()
+        hash_start = time.monotonic()
+        try:
+            if self.pool is not None:
+                response = self.pool.apply(hash_request, (body,))
+            else:
+                response = hash_request(body)
+        except Exception as e:
+            response = wire.encode_error("Unable to hash graph: {}".format(e))
+        with self.lock:
+            self.counts['hashed'] += 1
+            self.hash_times.append(time.monotonic() - hash_start)
+            del self.in_flight[key]
+            if response[0] == wire.STATUS_OK and self.cache_size > 0:
+                self.cache[key] = response
+                while len(self.cache) > self.cache_size:
+                    self.cache.popitem(last=False)
+        future.set_result(response)
+        return response
+
+    # Returns a dictionary with the request counts, the cache size, the throughput (requests per second since
+    # the server started) and latency summaries in milliseconds
+    def stats(self):
+        with self.lock:
+            uptime = time.monotonic() - self.start_time
+            stats = dict(self.counts)
+            stats['uptime'] = uptime
+            stats['throughput'] = stats['requests'] / uptime if uptime > 0 else 0.0
+            stats['cache_entries'] = len(self.cache)
+            stats['in_flight'] = len(self.in_flight)
+            stats['latency_ms'] = latency_summary(self.latencies)
+            stats['hash_time_ms'] = latency_summary(self.hash_times)
+        return stats
+
+# Removes a socket file left behind by a server that is no longer running. Raises OSError if a server is
+# still listening on the socket.
+def remove_stale_socket(socket_path):
+    if not os.path.exists(socket_path):
+        return
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path)
+    except (ConnectionRefusedError, FileNotFoundError):
+        os.unlink(socket_path)
+        return
+    finally:
+        sock.close()
+    raise OSError("A server is already listening on " + socket_path)
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog='dihash-server',
+        description='Serve graph hashing requests from dihash clients on a Unix socket.')
+    parser.add_argument('-s', '--socket', default=None,
+        help='Path of the Unix socket. Defaults to $DIHASH_SOCKET, or dihash.sock in $XDG_RUNTIME_DIR or in a private dihash-<uid> directory in the temporary directory.')
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+        help='Number of worker processes. Defaults to one per CPU, 0 hashes in the server process.')
+    parser.add_argument('--cache-size', type=int, default=100000,
+        help='Maximum number of results kept in the cache.')
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    server = HashServer(args.socket, processes=args.jobs, cache_size=args.cache_size)
+    # Exit through the finally block on SIGTERM, so the socket is removed
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    sys.stderr.write('dihash-server listening on {}\n'.format(server.socket_path))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,253 @@
+from multiprocessing import resource_tracker, shared_memory
+import sys
+import numpy as np
+from .hash_impl import hash_indexed_graph, hash_sha256
+
+# Transport for hashing many graphs in worker processes without pickling NetworkX graphs.
+#
+# A batch of graphs is packed into one shared memory block as flat int64 arrays plus a table
+# of labels, and a second shared memory block holds a fixed size slot for every graph hash and
+# node hash. Workers only receive the names of the two blocks and a range of graph indices.
+# They attach to the blocks, read the arrays in place, hash the graphs with hash_indexed_graph
+# and write the hashes into their slots.
+#
+# Layout of the graph block, every entry is an int64 unless noted otherwise:
+# - header: num_graphs, total_nodes, total_edges, num_labels, num_label_bytes
+# - node_offsets (num_graphs + 1): the nodes of graph i are node_offsets[i],...,node_offsets[i+1]-1
+# - edge_offsets (num_graphs + 1): the edges of graph i are edge_offsets[i],...,edge_offsets[i+1]-1
+# - graph_labels (num_graphs): index of the label of each graph in the label table, or -1
+# - node_labels (total_nodes): index of the label of each node in the label table
+# - sources, targets (total_edges each): edge endpoints as node indices local to their graph
+# - label_offsets (num_labels + 1): label j is label_bytes[label_offsets[j]:label_offsets[j+1]]
+# - label_bytes (num_label_bytes bytes): the UTF-8 encoded labels
+#
+# The result block has num_graphs + total_nodes slots of hash_size bytes. Slot i holds the hash of
+# graph i, and slot num_graphs + node_offsets[i] + j holds the hash of node j of graph i. Hashes
+# shorter than hash_size are padded with zero bytes.
+
+HEADER_SIZE = 5
+INT_SIZE = 8
+
+# The hex digest of hash_sha256 is 64 characters long
+SHA256_HASH_SIZE = 64
+
+# Computes the offsets (in units of int64) of the arrays in the graph block
+def graph_block_layout(num_graphs, total_nodes, total_edges, num_labels):
+    sizes = [
+        ('header', HEADER_SIZE),
+        ('node_offsets', num_graphs + 1),
+        ('edge_offsets', num_graphs + 1),
+        ('graph_labels', num_graphs),
+        ('node_labels', total_nodes),
+        ('sources', total_edges),
+        ('targets', total_edges),
+        ('label_offsets', num_labels + 1),
+    ]
+    layout = {}
+    offset = 0
+    for (name, size) in sizes:
+        layout[name] = (offset, size)
+        offset += size
+    return (layout, offset)
+
+def graph_block_views(buf, layout):
+    return {name: np.ndarray((size,), dtype=np.int64, buffer=buf, offset=offset * INT_SIZE) for (name, (offset, size)) in layout.items()}
+
+# The pid of the resource tracker process that shared memory blocks created by this process are
+# registered with
+def resource_tracker_pid():
+    if sys.version_info >= (3, 13):
+        return None
+    resource_tracker.ensure_running()
+    return resource_tracker._resource_tracker._pid
+
+# Attach to an existing shared memory block. Blocks are created and unlinked by SharedGraphBatch,
+# so an attaching process must not leave them registered with a resource tracker of its own, which
+# would unlink the blocks when the attaching process exits. Processes that share the tracker of the
+# creating process (e.g. pool workers started after the block was created) can leave the
+# registration, since registering a block twice with the same tracker is harmless.
+def attach_shared_memory(name, creator_tracker_pid):
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    # Forked processes inherit the pid of the tracker, while spawned processes only inherit its pipe
+    tracker = resource_tracker._resource_tracker
+    shares_tracker = tracker._pid == creator_tracker_pid or (tracker._pid is None and tracker._fd is not None)
+    block = shared_memory.SharedMemory(name=name)
+    if not shares_tracker:
+        resource_tracker.unregister(block._name, 'shared_memory')
+    return block
+
+# Owns the shared memory blocks for a batch of NetworkX digraphs. Node and graph labels must be
+# strings. spec is a small picklable tuple that workers pass to AttachedGraphBatch.
+#
+# The SCCs of a merkle hash can be packed as well, by packing the graphs returned by
+# scc_graph(g, scc_members, node_hashes, string_hash_fun), whose labels include the hashes of
+# the successors outside of the SCC.
+class SharedGraphBatch:
+    def __init__(self, graphs, hash_size=SHA256_HASH_SIZE):
+        self.nodes = [list(g.nodes) for g in graphs]
+        self.hash_size = hash_size
+        num_graphs = len(self.nodes)
+        label_to_idx = {}
+        def label_index(label):
+            if not isinstance(label, str):
+                raise TypeError("SharedGraphBatch requires string labels, got " + repr(label))
+            if label not in label_to_idx:
+                label_to_idx[label] = len(label_to_idx)
+            return label_to_idx[label]
+
+        node_offsets = [0]
+        edge_offsets = [0]
+        graph_labels = []
+        node_labels = []
+        sources = []
+        targets = []
+        for (g, nodes) in zip(graphs, self.nodes):
+            node_to_idx = {n: i for (i, n) in enumerate(nodes)}
+            graph_labels.append(label_index(g.graph['label']) if 'label' in g.graph else -1)
+            node_labels.extend(label_index(g.nodes[n]['label']) for n in nodes)
+            for (s, t) in g.edges:
+                sources.append(node_to_idx[s])
+                targets.append(node_to_idx[t])
+            node_offsets.append(len(node_labels))
+            edge_offsets.append(len(sources))
+        encoded_labels = [label.encode('utf-8') for label in label_to_idx]
+        label_offsets = np.zeros(len(encoded_labels) + 1, dtype=np.int64)
+        np.cumsum([len(label) for label in encoded_labels], out=label_offsets[1:])
+        label_bytes = b''.join(encoded_labels)
+
+        (layout, num_ints) = graph_block_layout(num_graphs, len(node_labels), len(sources), len(encoded_labels))
+        # SharedMemory does not accept a size of zero
+        self.graph_block = shared_memory.SharedMemory(create=True, size=num_ints * INT_SIZE + max(len(label_bytes), 1))
+        self.result_block = shared_memory.SharedMemory(create=True, size=max((num_graphs + len(node_labels)) * hash_size, 1))
+        views = graph_block_views(self.graph_block.buf, layout)
+        views['header'][:] = [num_graphs, len(node_labels), len(sources), len(encoded_labels), len(label_bytes)]
+        views['node_offsets'][:] = node_offsets
+        views['edge_offsets'][:] = edge_offsets
+        views['graph_labels'][:] = graph_labels
+        views['node_labels'][:] = node_labels
+        views['sources'][:] = sources
+        views['targets'][:] = targets
+        views['label_offsets'][:] = label_offsets
+        self.graph_block.buf[num_ints * INT_SIZE:num_ints * INT_SIZE + len(label_bytes)] = label_bytes
+        self.node_offsets = node_offsets
+        self.tracker_pid = resource_tracker_pid()
+        del views
+
+    @property
+    def spec(self):
+        return (self.graph_block.name, self.result_block.name, self.hash_size, self.tracker_pid)
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def read_slot(self, slot):
+        start = slot * self.hash_size
+        return bytes(self.result_block.buf[start:start + self.hash_size]).rstrip(b'\0').decode('utf-8')
+
+    # The hash of graph i, once a worker has hashed it
+    def graph_hash(self, i):
+        return self.read_slot(i)
+
+    # Dictionary mapping the nodes of graph i to their hashes, once a worker has hashed it with hash_nodes=True
+    def node_hashes(self, i):
+        first_slot = len(self.nodes) + self.node_offsets[i]
+        return {n: self.read_slot(first_slot + j) for (j, n) in enumerate(self.nodes[i])}
+
+    def close(self):
+        for block in (self.graph_block, self.result_block):
+            block.close()
+            block.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+# The worker side of a SharedGraphBatch. The int arrays are numpy views of the shared memory,
+# so attaching does not copy the graphs.
+class AttachedGraphBatch:
+    def __init__(self, spec):
+        (graph_block_name, result_block_name, self.hash_size, tracker_pid) = spec
+        self.graph_block = attach_shared_memory(graph_block_name, tracker_pid)
+        self.result_block = attach_shared_memory(result_block_name, tracker_pid)
+        header = np.ndarray((HEADER_SIZE,), dtype=np.int64, buffer=self.graph_block.buf)
+        (self.num_graphs, total_nodes, total_edges, num_labels, num_label_bytes) = header.tolist()
+        del header
+        (layout, num_ints) = graph_block_layout(self.num_graphs, total_nodes, total_edges, num_labels)
+        self.views = graph_block_views(self.graph_block.buf, layout)
+        self.label_bytes_offset = num_ints * INT_SIZE
+        self.labels = {}
+
+    def label(self, j):
+        if j not in self.labels:
+            start = self.label_bytes_offset + int(self.views['label_offsets'][j])
+            end = self.label_bytes_offset + int(self.views['label_offsets'][j + 1])
+            self.labels[j] = bytes(self.graph_block.buf[start:end]).decode('utf-8')
+        return self.labels[j]
+
+    # Returns graph i as the arguments of hash_indexed_graph: (num_nodes, edges, labels, graph_label)
+    def graph(self, i):
+        views = self.views
+        (node_start, node_end) = (views['node_offsets'][i], views['node_offsets'][i + 1])
+        (edge_start, edge_end) = (views['edge_offsets'][i], views['edge_offsets'][i + 1])
+        labels = [self.label(j) for j in views['node_labels'][node_start:node_end].tolist()]
+        edges = list(zip(views['sources'][edge_start:edge_end].tolist(), views['targets'][edge_start:edge_end].tolist()))
+        graph_label_idx = int(views['graph_labels'][i])
+        graph_label = self.label(graph_label_idx) if graph_label_idx >= 0 else None
+        return (int(node_end - node_start), edges, labels, graph_label)
+
+    def write_slot(self, slot, h):
+        encoded = h.encode('utf-8')
+        if len(encoded) > self.hash_size:
+            raise ValueError("Hash {!r} is longer than the hash size of {} bytes".format(h, self.hash_size))
+        start = slot * self.hash_size
+        self.result_block.buf[start:start + self.hash_size] = encoded.ljust(self.hash_size, b'\0')
+
+    def write_hashes(self, i, g_hash, node_hashes):
+        self.write_slot(i, g_hash)
+        if node_hashes is not None:
+            first_slot = self.num_graphs + int(self.views['node_offsets'][i])
+            for (j, h) in enumerate(node_hashes):
+                self.write_slot(first_slot + j, h)
+
+    def close(self):
+        # The numpy views have to be released before the shared memory can be closed
+        self.views = None
+        self.graph_block.close()
+        self.result_block.close()
+
+# Worker function: hashes graphs start,...,stop-1 of the batch described by spec and writes the
+# hashes into the result block. string_hash_fun must be picklable, e.g. a module level function.
+def hash_shared_graphs(spec, start, stop, hash_nodes=True, string_hash_fun=hash_sha256):
+    batch = AttachedGraphBatch(spec)
+    try:
+        for i in range(start, stop):
+            (num_nodes, edges, labels, graph_label) = batch.graph(i)
+            (g_hash, node_hashes) = hash_indexed_graph(num_nodes, edges, labels, graph_label, hash_nodes, string_hash_fun)
+            batch.write_hashes(i, g_hash, node_hashes)
+    finally:
+        batch.close()
+
+# Hashes a list of NetworkX digraphs with a multiprocessing pool, using a SharedGraphBatch to
+# transport the graphs and hashes. Returns a list of (g_hash, node_hashes) tuples, identical to
+# calling hash_graph(g, hash_nodes=hash_nodes, string_hash_fun=string_hash_fun) on every graph.
+# If pool is None, a pool with the given number of processes is created for this call.
+# hash_size must be at least the length of the hashes produced by string_hash_fun.
+def hash_graphs_shared(graphs, pool=None, processes=None, hash_nodes=True, string_hash_fun=hash_sha256, chunksize=16, hash_size=SHA256_HASH_SIZE):
+    graphs = list(graphs)
+    own_pool = pool is None
+    if own_pool:
+        import multiprocessing
+        pool = multiprocessing.Pool(processes)
+    try:
+        with SharedGraphBatch(graphs, hash_size=hash_size) as batch:
+            tasks = [(batch.spec, start, min(start + chunksize, len(batch)), hash_nodes, string_hash_fun)
+                     for start in range(0, len(batch), chunksize)]
+            pool.starmap(hash_shared_graphs, tasks)
+            return [(batch.graph_hash(i), batch.node_hashes(i) if hash_nodes else None) for i in range(len(batch))]
+    finally:
+        if own_pool:
+            pool.close()
+            pool.join()
@@ -0,0 +1,141 @@
+from array import array
+from .hash_impl import to_str, hash_sha256
+
+# Hashing of rooted trees and forests without nauty.
+#
+# An out-forest is a digraph without cycles where every node has at most one predecessor, such as
+# a syntax tree with edges from parents to children. Its isomorphism class is determined by the
+# classes of its subtrees, which can be computed bottom-up in the style of the Aho-Hopcroft-Ullman
+# algorithm: the class of a node is determined by its label and the sorted classes of its children.
+# Two nodes are in the same automorphism orbit if and only if their subtrees are in the same class
+# and their parents are in the same orbit (or both are roots).
+#
+# hash_tree hashes a summary of these classes instead of the canonical form computed by nauty, so
+# its hashes differ from those of hash_graph. The summary is tagged with TREE_HASH_VERSION, which
+# changes whenever the summary changes.
+
+TREE_HASH_VERSION = 1
+
+# Returns a dictionary mapping every node of g to a list of its successors
+def successor_lists(g):
+    return {n: list(successors) for (n, successors) in g.adjacency()}
+
+# Returns the nodes in breadth first order from the roots, or None if the graph given by the successor
+# lists children is not an out-forest
+def out_forest_order(children):
+    num_parents = dict.fromkeys(children, 0)
+    for successors in children.values():
+        for c in successors:
+            num_parents[c] += 1
+    order = []
+    for (n, count) in num_parents.items():
+        if count > 1:
+            return None
+        if count == 0:
+            order.append(n)
+    i = 0
+    while i < len(order):
+        order.extend(children[order[i]])
+        i += 1
+    # Nodes on a cycle have a parent, so they cannot be reached from the roots
+    if len(order) != len(children):
+        return None
+    return order
+
+# Returns True if every node of the NetworkX digraph g has at most one predecessor and g has no cycles
+def is_out_forest(g):
+    return out_forest_order(successor_lists(g)) is not None
+
+# Returns True if g is an out-forest with exactly one root
+def is_out_tree(g):
+    return is_out_forest(g) and sum(1 for n in g.nodes if g.in_degree(n) == 0) == 1
+
+# Numbers the nodes level by level, where levels is a list of lists of nodes. The distinct keys of each
+# level are numbered in sorted order, continuing from the numbers of the previous levels, and each node
+# gets the number of its key. key(n, numbers) may use the numbers of the nodes of previous levels.
+# Returns a dictionary mapping nodes to their numbers and the list of distinct keys, in order.
+def number_levels(levels, key):
+    numbers = {}
+    distinct_keys = []
+    for level in levels:
+        level_keys = {n: key(n, numbers) for n in level}
+        sorted_keys = sorted(set(level_keys.values()))
+        key_numbers = {k: len(distinct_keys) + i for (i, k) in enumerate(sorted_keys)}
+        distinct_keys.extend(sorted_keys)
+        for n in level:
+            numbers[n] = key_numbers[level_keys[n]]
+    return (numbers, distinct_keys)
+
+# Groups nodes into a list of levels, where level[n] is the level of node n
+def group_levels(nodes, level):
+    levels = [[] for _ in range(max(level.values(), default=-1) + 1)]
+    for n in nodes:
+        levels[level[n]].append(n)
+    return levels
+
+# hash_tree has the same inputs and outputs as hash_graph (without apply_quotient), but only accepts
+# out-forests and raises ValueError for other graphs. Its hashes are different from the hashes computed
+# by hash_graph, but two out-forests have the same hash_tree hash if and only if they have the same
+# hash_graph hash, and two nodes of an out-forest have the same hash_tree hash if and only if they have
+# the same hash_graph hash. hash_tree does not call nauty, and apart from sorting runs in linear time.
+#
+# If return_canonical is True, hash_tree also returns a canonical labelling (canonical_order, orbit_ids) in
+# the format described in hash_graph, so dihash.isomorphism can be applied to the results of hash_tree. The
+# canonical order lists the roots and then the children of every node in breadth first order, each sorted
+# by the class of its subtree, and orbit_ids[i] is the index of the orbit of node i used for the node hashes.
+# The canonical order is not the one computed by nauty.
+def hash_tree(g, hash_nodes=True, string_hash_fun=hash_sha256, return_canonical=False):
+    children = successor_lists(g)
+    order = out_forest_order(children)
+    if order is None:
+        raise ValueError("hash_tree requires an out-forest: a digraph without cycles where every node has at most one predecessor")
+    labels = {n: attributes['label'] for (n, attributes) in g.nodes(data=True)}
+
+    # The breadth first order visits every parent before its children
+    parent = {}
+    depth = {}
+    for n in order:
+        if n not in parent:
+            depth[n] = 0
+        for c in children[n]:
+            parent[c] = n
+            depth[c] = depth[n] + 1
+    # The height of a node is the length of the longest path down to a leaf
+    height = {}
+    for n in reversed(order):
+        height[n] = 1 + max([height[c] for c in children[n]], default=-1)
+
+    # The class of a node numbers its label and the sorted classes of its children, which have a smaller height
+    def class_key(n, subtree_class):
+        return (labels[n], tuple(sorted([subtree_class[c] for c in children[n]])))
+    (subtree_class, classes) = number_levels(group_levels(order, height), class_key)
+    roots = sorted(subtree_class[n] for n in order if n not in parent)
+
+    summary_classes = [(label, list(class_children)) for (label, class_children) in classes]
+    if 'label' in g.graph:
+        g_summary = ('tree', TREE_HASH_VERSION, g.graph['label'], summary_classes, roots)
+    else:
+        g_summary = ('tree', TREE_HASH_VERSION, summary_classes, roots)
+    g_hash = string_hash_fun(to_str(g_summary))
+
+    node_hashes = None
+    if hash_nodes or return_canonical:
+        # The orbit of a node numbers the orbit of its parent (-1 for roots) and the class of its subtree
+        def orbit_key(n, orbit):
+            return (orbit[parent[n]] if n in parent else -1, subtree_class[n])
+        (orbit, orbit_keys) = number_levels(group_levels(order, depth), orbit_key)
+    if hash_nodes:
+        orbit_hashes = [string_hash_fun(to_str((orbit_i, g_hash))) for orbit_i in range(len(orbit_keys))]
+        node_hashes = {n: orbit_hashes[orbit[n]] for n in order}
+    if return_canonical:
+        # Subtrees in the same class are isomorphic, so ties between them can be broken arbitrarily
+        canonical_nodes = sorted([n for n in order if n not in parent], key=subtree_class.__getitem__)
+        i = 0
+        while i < len(canonical_nodes):
+            canonical_nodes.extend(sorted(children[canonical_nodes[i]], key=subtree_class.__getitem__))
+            i += 1
+        node_to_idx = {n: i for (i, n) in enumerate(g.nodes)}
+        canonical_order = array('l', [node_to_idx[n] for n in canonical_nodes])
+        orbit_ids = array('l', [orbit[n] for n in g.nodes])
+        return (g_hash, node_hashes, (canonical_order, orbit_ids))
+    return (g_hash, node_hashes)
@@ -0,0 +1,213 @@
+import os
+import stat
+import struct
+import tempfile
+from array import array
+
+# Wire format of the dihash server (dihash/server.py) and its clients (dihash/client.py).
+#
+# This module only uses the standard library, so clients can talk to the server without
+# importing NetworkX or pynauty. Every message is a 4 byte little endian body length followed
+# by the body. The first byte of a request body is the operation:
+# - OP_HASH: a graph in indexed form (see encode_hash_request), answered with its hashes
+# - OP_STATS: answered with the server metrics as a JSON object
+# The first byte of a response body is STATUS_OK or STATUS_ERROR. An error response holds a
+# message. Strings are a 4 byte little endian length followed by UTF-8 bytes, and arrays of
+# integers are unsigned 32 bit integers in native byte order, since the server and its clients
+# always run on the same machine.
+
+OP_HASH = b'H'
+OP_STATS = b'S'
+
+STATUS_OK = 0
+STATUS_ERROR = 1
+
+FLAG_HASH_NODES = 1
+FLAG_GRAPH_LABEL = 2
+
+# Messages larger than this are rejected, to protect the server from corrupted length prefixes
+MAX_MESSAGE_SIZE = 1 << 30
+
+# The directory of the default socket: $XDG_RUNTIME_DIR, or else a per-user directory in the temporary
+# directory, which the server creates with mode 0700 (see make_private_dir)
+def default_socket_dir():
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR')
+    if runtime_dir:
+        return runtime_dir
+    return os.path.join(tempfile.gettempdir(), 'dihash-{}'.format(os.getuid()))
+
+# The socket used by the server and the clients when no path is given: the DIHASH_SOCKET environment
+# variable, or dihash.sock in default_socket_dir()
+def default_socket_path():
+    path = os.environ.get('DIHASH_SOCKET')
+    if path:
+        return path
+    return os.path.join(default_socket_dir(), 'dihash.sock')
+
+# Creates the directory path with mode 0700 if it does not exist. Raises OSError if it is not a directory that
+# is owned by the current user and inaccessible to other users, since another user could then replace the socket.
+def make_private_dir(path):
+    try:
+        os.mkdir(path, 0o700)
+    except FileExistsError:
+        pass
+    st = os.lstat(path)
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid() or st.st_mode & 0o077:
+        raise OSError("{} must be a directory owned by the current user that other users cannot access".format(path))
+
+# Returns True if the socket at path exists and is owned by the current user. Clients only connect to such
+# sockets, so another user cannot answer their requests with forged hashes.
+def owned_by_current_user(path):
+    try:
+        return os.stat(path).st_uid == os.getuid()
+    except OSError:
+        return False
+
+def encode_string(s):
+    if not isinstance(s, str):
+        raise TypeError("Labels must be strings, got " + repr(s))
+    data = s.encode('utf-8')
+    return struct.pack('<I', len(data)) + data
+
+def encode_array(values):
+    return array('I', values).tobytes()
+
+# Reads the fields of a message body in order. Raises ValueError if the body is too short.
+class BodyReader:
+    def __init__(self, body, offset=0):
+        self.body = body
+        self.offset = offset
+
+    def read_bytes(self, size):
+        if self.offset + size > len(self.body):
+            raise ValueError("Truncated message")
+        data = self.body[self.offset:self.offset + size]
+        self.offset += size
+        return data
+
+    def read_uint8(self):
+        return self.read_bytes(1)[0]
+
+    def read_uint32(self):
+        return struct.unpack('<I', self.read_bytes(4))[0]
+
+    def read_string(self):
+        return self.read_bytes(self.read_uint32()).decode('utf-8')
+
+    def read_array(self, count):
+        values = array('I')
+        values.frombytes(self.read_bytes(count * values.itemsize))
+        return values
+
+    def check_end(self):
+        if self.offset != len(self.body):
+            raise ValueError("Unexpected data at the end of the message")
+
+# Encodes a graph in the form taken by hash_indexed_graph: nodes are the indices 0,...,num_nodes-1, edges is
+# a list of (source, target) index pairs and labels[i] is the label of node i. Each distinct label is only
+# sent once, followed by the index of the label of every node and the flattened edge array.
+def encode_hash_request(num_nodes, edges, labels, graph_label=None, hash_nodes=True):
+    label_indices = {}
+    for label in labels:
+        if label not in label_indices:
+            label_indices[label] = len(label_indices)
+    flags = (FLAG_HASH_NODES if hash_nodes else 0) | (FLAG_GRAPH_LABEL if graph_label is not None else 0)
+    parts = [OP_HASH, struct.pack('<BIII', flags, num_nodes, len(edges), len(label_indices))]
+    parts.extend(encode_string(label) for label in label_indices)
+    if graph_label is not None:
+        parts.append(encode_string(graph_label))
+    parts.append(encode_array(label_indices[label] for label in labels))
+    parts.append(encode_array(i for edge in edges for i in edge))
+    return b''.join(parts)
+
+# Decodes a body created by encode_hash_request. Returns (num_nodes, edges, labels, graph_label, hash_nodes).
+# Raises ValueError if the body is malformed.
+def decode_hash_request(body):
+    reader = BodyReader(body)
+    if reader.read_bytes(1) != OP_HASH:
+        raise ValueError("Not a hash request")
+    flags = reader.read_uint8()
+    num_nodes = reader.read_uint32()
+    num_edges = reader.read_uint32()
+    num_labels = reader.read_uint32()
+    label_table = [reader.read_string() for _ in range(num_labels)]
+    graph_label = reader.read_string() if flags & FLAG_GRAPH_LABEL else None
+    label_indices = reader.read_array(num_nodes)
+    flat_edges = reader.read_array(2 * num_edges)
+    reader.check_end()
+    if any(i >= num_labels for i in label_indices):
+        raise ValueError("Label index out of range")
+    if any(i >= num_nodes for i in flat_edges):
+        raise ValueError("Edge endpoint out of range")
+    labels = [label_table[i] for i in label_indices]
+    edges = list(zip(flat_edges[0::2], flat_edges[1::2]))
+    return (num_nodes, edges, labels, graph_label, bool(flags & FLAG_HASH_NODES))
+
+# Encodes the result of hash_indexed_graph. Nodes in the same orbit have the same hash, so every distinct
+# node hash is only sent once, followed by the index of the hash of every node.
+def encode_hash_response(g_hash, node_hashes):
+    parts = [struct.pack('<B', STATUS_OK), encode_string(g_hash)]
+    if node_hashes is None:
+        parts.append(struct.pack('<B', 0))
+    else:
+        hash_indices = {}
+        for h in node_hashes:
+            if h not in hash_indices:
+                hash_indices[h] = len(hash_indices)
+        parts.append(struct.pack('<BII', 1, len(node_hashes), len(hash_indices)))
+        parts.extend(encode_string(h) for h in hash_indices)
+        parts.append(encode_array(hash_indices[h] for h in node_hashes))
+    return b''.join(parts)
+
+def encode_error(message):
+    return struct.pack('<B', STATUS_ERROR) + encode_string(message)
+
+def encode_stats_response(stats_json):
+    return struct.pack('<B', STATUS_OK) + encode_string(stats_json)
+
+# Returns the reader positioned after the status byte. Raises ValueError with the message of an error response.
+def response_reader(body):
+    reader = BodyReader(body)
+    if reader.read_uint8() == STATUS_ERROR:
+        raise ValueError(reader.read_string())
+    return reader
+
+# Decodes a body created by encode_hash_response. Returns (g_hash, node_hashes), where node_hashes is a list
+# where element i is the hash of node i, or None if the node hashes were not requested.
+def decode_hash_response(body):
+    reader = response_reader(body)
+    g_hash = reader.read_string()
+    node_hashes = None
+    if reader.read_uint8():
+        num_nodes = reader.read_uint32()
+        hash_table = [reader.read_string() for _ in range(reader.read_uint32())]
+        node_hashes = [hash_table[i] for i in reader.read_array(num_nodes)]
+    reader.check_end()
+    return (g_hash, node_hashes)
+
+def decode_stats_response(body):
+    return response_reader(body).read_string()
+
+def send_message(sock, body):
+    sock.sendall(struct.pack('<I', len(body)) + body)
+
+def recv_exactly(sock, size):
+    data = bytearray(size)
+    view = memoryview(data)
+    received = 0
+    while received < size:
+        n = sock.recv_into(view[received:])
+        if n == 0:
+            return None
+        received += n
+    return bytes(data)
+
+# Returns the body of the next message, or None if the connection was closed
+def recv_message(sock):
+    header = recv_exactly(sock, 4)
+    if header is None:
+        return None
+    (size,) = struct.unpack('<I', header)
+    if size > MAX_MESSAGE_SIZE:
+        raise ValueError("Message of {} bytes exceeds the maximum message size".format(size))
+    return recv_exactly(sock, size)
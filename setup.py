@@ -12,5 +12,8 @@ setup(
    author='Caleb Helbling',
    author_email='caleb.helbling@yahoo.com',
    packages=['dihash'],
-   install_requires=['pynauty', 'networkx']
+   install_requires=['pynauty', 'networkx', 'numpy'],
+   entry_points={
+      'console_scripts': ['dihash=dihash.cli:main', 'dihash-server=dihash.server:main']
+   }
 )
\ No newline at end of file
@@ -0,0 +1,82 @@
+import networkx as nx
+import dihash
+import pytest
+
+def add_labeled_node(g, n, label):
+    g.add_node(n)
+    g.nodes[n]['label'] = label
+
+def test_merkle_builder():
+    # The expression (x + x) * f(cycle), where cycle is a 3-cycle that points to x
+    g = nx.DiGraph()
+    add_labeled_node(g, 'x1', 'x')
+    add_labeled_node(g, 'x2', 'x')
+    add_labeled_node(g, 'x3', 'x')
+    add_labeled_node(g, 'plus', '+')
+    add_labeled_node(g, 'c0', 'c')
+    add_labeled_node(g, 'c1', 'c')
+    add_labeled_node(g, 'c2', 'd')
+    add_labeled_node(g, 'loop', 'l')
+    add_labeled_node(g, 'f', 'f')
+    add_labeled_node(g, 'times', '*')
+    g.add_edges_from([('plus', 'x1'), ('plus', 'x2'), ('c0', 'c1'), ('c1', 'c2'), ('c2', 'c0'), ('c2', 'x3'),
+                      ('loop', 'loop'), ('f', 'c0'), ('f', 'loop'), ('times', 'plus'), ('times', 'f')])
+
+    for apply_quotient in [False, True]:
+        (_, _, expected) = dihash.merkle_hash_graph(g, apply_quotient=apply_quotient)
+
+        builder = dihash.MerkleBuilder(apply_quotient=apply_quotient)
+        x = builder.add_node('x')
+        plus = builder.add_node('+', [x, x])
+
+        cycle = builder.cyclic_group()
+        c0 = cycle.add_node('c')
+        c1 = cycle.add_node('c')
+        c2 = cycle.add_node('d', [x])
+        cycle.add_edge(c0, c1)
+        cycle.add_edge(c1, c2)
+        cycle.add_edge(c2, c0)
+        cycle_hashes = cycle.close()
+
+        loop_group = builder.cyclic_group()
+        loop_node = loop_group.add_node('l')
+        loop_group.add_edge(loop_node, loop_node)
+        [loop] = loop_group.close()
+
+        f = builder.add_node('f', [cycle_hashes[c0], loop])
+        times = builder.add_node('*', [plus, f])
+
+        assert(x == expected['x1'] == expected['x2'] == expected['x3'])
+        assert(plus == expected['plus'])
+        assert(cycle_hashes == [expected['c0'], expected['c1'], expected['c2']])
+        assert(loop == expected['loop'])
+        assert(f == expected['f'])
+        assert(times == expected['times'])
+
+        # Structurally identical nodes are only stored once
+        assert(builder.add_node('+', [x, x]) == plus)
+        assert(len(builder) == 8)
+        assert(builder.label(cycle_hashes[c2]) == 'd')
+        assert(builder.successors(cycle_hashes[c2]) == sorted([x, cycle_hashes[c0]]))
+        assert(builder.successors(plus) == [x, x])
+
+    print("test_merkle_builder passed")
+
+def test_merkle_builder_errors():
+    builder = dihash.MerkleBuilder()
+    with pytest.raises(KeyError):
+        builder.add_node('a', ['not a node'])
+
+    group = builder.cyclic_group()
+    a = group.add_node('a')
+    b = group.add_node('b')
+    group.add_edge(a, b)
+    with pytest.raises(ValueError):
+        group.close()
+
+    group.add_edge(b, a)
+    group.close()
+    with pytest.raises(ValueError):
+        group.add_node('c')
+
+    print("test_merkle_builder_errors passed")
@@ -0,0 +1,127 @@
+import json
+import networkx as nx
+import dihash
+from dihash import cli
+import pytest
+
+def cycle_graph(num_nodes, label):
+    g = nx.DiGraph()
+    for i in range(num_nodes):
+        g.add_node(i)
+        g.nodes[i]['label'] = label
+    for i in range(num_nodes):
+        g.add_edge(i, (i + 1) % num_nodes)
+    return g
+
+def run_cli(capsys, argv):
+    ret = cli.main(argv)
+    lines = capsys.readouterr().out.splitlines()
+    return (ret, [json.loads(line) for line in lines])
+
+def test_cli_jsonl(tmp_path, capsys):
+    path = tmp_path / 'graphs.jsonl'
+    with open(path, 'w') as f:
+        f.write(json.dumps({'id': 'g1', 'nodes': {'0': 'a', '1': 'a', '2': 'a'}, 'edges': [[0, 1], [1, 2], [2, 0]]}) + '\n')
+        f.write(json.dumps({'nodes': ['x', 'y'], 'edges': [['x', 'y']]}) + '\n')
+        f.write('{not json}\n')
+
+    (ret, results) = run_cli(capsys, ['--node-hashes', str(path)])
+
+    (g_hash, node_hashes) = dihash.hash_graph(cycle_graph(3, 'a'))
+    assert(ret == 1)
+    assert(results[0]['id'] == 'g1')
+    assert(results[0]['hash'] == g_hash)
+    assert(results[0]['node_hashes'] == {str(n): h for (n, h) in node_hashes.items()})
+    assert(results[1]['id'] == str(path) + ':2')
+    assert('error' in results[2])
+
+    print("test_cli_jsonl passed")
+
+def test_cli_edgelist_parallel(tmp_path, capsys):
+    path = tmp_path / 'graphs.edgelist'
+    with open(path, 'w') as f:
+        for num_nodes in range(1, 9):
+            f.write('# cycle with {} nodes\n'.format(num_nodes))
+            for i in range(num_nodes):
+                f.write('{} {}\n'.format(i, (i + 1) % num_nodes))
+            f.write('\n')
+
+    (ret, results) = run_cli(capsys, ['--jobs', '2', '--chunksize', '3', str(path)])
+
+    assert(ret == 0)
+    assert([r['hash'] for r in results] == [dihash.hash_graph(cycle_graph(n, ''), hash_nodes=False)[0] for n in range(1, 9)])
+
+    print("test_cli_edgelist_parallel passed")
+
+def test_cli_bounded_reading():
+    import functools
+    import multiprocessing
+    num_read = [0]
+    def records():
+        for num_nodes in range(1, 41):
+            num_read[0] += 1
+            yield cli.make_record(num_nodes, [(str(i), 'a') for i in range(num_nodes)], [(str(i), str((i + 1) % num_nodes)) for i in range(num_nodes)])
+    hash_fun = functools.partial(cli.hash_record)
+    expected = [hash_fun(r) for r in records()]
+
+    with multiprocessing.Pool(2) as pool:
+        for unordered in [False, True]:
+            num_read[0] = 0
+            results = []
+            for result in cli.pool_results(pool, hash_fun, records(), 3, 4, unordered):
+                # At most 4 chunks of 3 records are in flight, and one more chunk is read when a chunk is written out
+                assert(num_read[0] <= 3 * (len(results) // 3 + 5))
+                results.append(result)
+            if unordered:
+                results.sort(key=lambda r: r['id'])
+            assert(results == expected)
+
+    print("test_cli_bounded_reading passed")
+
+def test_cli_deep_merkle(tmp_path, capsys, monkeypatch):
+    # A chain much longer than the recursion limit, followed by a small graph
+    path = tmp_path / 'graphs.edgelist'
+    with open(path, 'w') as f:
+        for i in range(3000):
+            f.write('{} {}\n'.format(i, i + 1))
+        f.write('\n0 1\n1 0\n')
+
+    chain = nx.DiGraph([(str(i), str(i + 1)) for i in range(3000)])
+    for n in chain.nodes():
+        chain.nodes[n]['label'] = ''
+    (_, _, chain_node_hashes) = dihash.merkle_hash_graph(chain)
+    (_, _, cycle_node_hashes) = dihash.merkle_hash_graph(cycle_graph(2, ''))
+    for argv in [['--merkle', str(path)], ['--merkle', '--jobs', '2', str(path)]]:
+        (ret, results) = run_cli(capsys, argv)
+        assert(ret == 0)
+        assert(results[0]['node_hashes'] == chain_node_hashes)
+        assert(results[1]['node_hashes'] == {str(n): h for (n, h) in cycle_node_hashes.items()})
+
+    # An unexpected error only fails its own record
+    merkle_hash_graph = dihash.hash_impl.merkle_hash_graph
+    def failing_merkle_hash_graph(g, **kwargs):
+        if g.number_of_nodes() > 2:
+            raise RuntimeError("too deep")
+        return merkle_hash_graph(g, **kwargs)
+    monkeypatch.setattr(dihash.hash_impl, 'merkle_hash_graph', failing_merkle_hash_graph)
+    (ret, results) = run_cli(capsys, ['--merkle', str(path)])
+    assert(ret == 1)
+    assert(results[0]['error'] == 'Unable to hash graph: RuntimeError: too deep')
+    assert(results[1]['node_hashes'] == {str(n): h for (n, h) in cycle_node_hashes.items()})
+
+    print("test_cli_deep_merkle passed")
+
+def test_cli_graphml_merkle(tmp_path, capsys):
+    g = cycle_graph(3, 'a')
+    g.add_node(3, label='b')
+    g.add_edge(0, 3)
+    path = tmp_path / 'graph.graphml'
+    nx.write_graphml(g, path)
+
+    (ret, results) = run_cli(capsys, ['--merkle', str(path)])
+
+    (_, _, node_hashes) = dihash.merkle_hash_graph(g)
+    assert(ret == 0)
+    assert(results[0]['node_hashes'] == {str(n): h for (n, h) in node_hashes.items()})
+
+    print("test_cli_graphml_merkle passed")
@@ -42,3 +42,24 @@ def generate_graphs_nx_iso(num_nodes):
 				return False
 		return True
 	return generate_graphs_generic(num_nodes, add_graph_fun)
+
+# Generate a random digraph with num_nodes nodes and num_edges edges, whose nodes are labeled 'a' and 'b'
+# alternately
+def random_labeled_graph(num_nodes, num_edges, seed):
+	g = nx.gnm_random_graph(num_nodes, num_edges, directed=True, seed=seed)
+	for n in g.nodes():
+		g.nodes[n]['label'] = 'ab'[n % 2]
+	return g
+
+# Generate num_graphs small random labeled digraphs with 2 to max_nodes nodes, where every third graph has a
+# graph label, followed by the empty graph
+def random_labeled_graphs(num_graphs, max_nodes=10):
+	graphs = []
+	for i in range(num_graphs):
+		num_nodes = 2 + i % (max_nodes - 1)
+		g = random_labeled_graph(num_nodes, 3 * num_nodes, i)
+		if i % 3 == 0:
+			g.graph['label'] = 'graph_label'
+		graphs.append(g)
+	graphs.append(nx.DiGraph())
+	return graphs
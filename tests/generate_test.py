@@ -0,0 +1,40 @@
+import networkx as nx
+import dihash
+from dihash.generate import generate_digraphs, generate_digraphs_parallel, digraph_to_networkx
+from .gen_graphs import generate_graphs
+
+# Number of digraphs with n unlabeled nodes, OEIS A000273 (without loops) and A000595 (with loops)
+NUM_DIGRAPHS = [1, 1, 3, 16, 218, 9608]
+NUM_DIGRAPHS_WITH_LOOPS = [1, 2, 10, 104, 3044]
+
+def test_generate_digraphs():
+    for (loops, counts) in [(False, NUM_DIGRAPHS), (True, NUM_DIGRAPHS_WITH_LOOPS)]:
+        for (num_nodes, count) in enumerate(counts):
+            graphs = list(generate_digraphs(num_nodes, loops=loops))
+            assert(len(graphs) == count)
+            # Generated graphs are canonical, so equal edge tuples mean isomorphic graphs
+            assert(len(set(graphs)) == count)
+            for (n, edges) in graphs:
+                assert(n == num_nodes)
+                assert(loops or all(s != t for (s, t) in edges))
+
+    # The graphs are pairwise non-isomorphic according to dihash
+    for num_nodes in range(4):
+        graphs = [digraph_to_networkx(graph) for graph in generate_digraphs(num_nodes, loops=True)]
+        hashes = set(dihash.hash_graph(g, hash_nodes=False)[0] for g in graphs)
+        assert(len(hashes) == len(graphs))
+        if num_nodes <= 3:
+            expected = set(dihash.hash_graph(g, hash_nodes=False)[0] for g in generate_graphs(num_nodes))
+            assert(hashes == expected)
+
+    print("test_generate_digraphs passed")
+
+def test_generate_digraphs_split():
+    expected = sorted(generate_digraphs(4, loops=True))
+    for (mod, split_depth) in [(1, None), (3, None), (7, 2), (5, 0), (4, 100)]:
+        parts = [list(generate_digraphs(4, loops=True, res=res, mod=mod, split_depth=split_depth)) for res in range(mod)]
+        assert(sorted(graph for part in parts for graph in part) == expected)
+
+    assert(sorted(generate_digraphs_parallel(4, loops=True, processes=2, num_parts=8)) == expected)
+
+    print("test_generate_digraphs_split passed")
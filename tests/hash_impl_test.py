@@ -2,6 +2,8 @@ import networkx as nx
 from .gen_graphs import *
 import dihash
 import pytest
+import random
+from concurrent.futures import ThreadPoolExecutor
 
 def test_quotient():
     g1 = nx.DiGraph()
@@ -310,6 +312,33 @@ def test_edge_encoding():
 
     print("test_edge_encoding passed")
 
+def test_quotient_trivial_sccs():
+    # A single node is its own quotient
+    g1 = nx.DiGraph()
+    g1.add_node(0)
+    g1.nodes[0]['label'] = 'a'
+    assert(dihash.hash_graph(g1, apply_quotient=True) == dihash.hash_graph(g1))
+
+    # An edgeless graph has no edge labels to encode, and all of its nodes are in one orbit
+    g3 = nx.DiGraph()
+    for i in range(3):
+        g3.add_node(i)
+        g3.nodes[i]['label'] = 'a'
+    (g_hash, node_hashes) = dihash.hash_graph(g3, apply_quotient=True)
+    assert(g_hash == dihash.hash_graph(g1, apply_quotient=True)[0])
+    assert(len(set(node_hashes.values())) == 1)
+
+    # Every SCC of a DAG is trivial, so the quotient does not change any hash
+    dag = nx.DiGraph([(0, 1), (0, 2), (1, 3), (2, 3), (3, 4)])
+    for n in dag.nodes():
+        dag.nodes[n]['label'] = 'ab'[n % 2]
+    (scc_hashes, _, node_hashes) = dihash.merkle_hash_graph(dag, apply_quotient=True)
+    expected = dihash.merkle_hash_graph(dag)
+    assert(scc_hashes == expected[0])
+    assert(node_hashes == expected[2])
+
+    print("test_quotient_trivial_sccs passed")
+
 def test_hash_graph_node_set():
     g = nx.DiGraph()
     g.add_node(1)
@@ -376,11 +405,202 @@ def test_hash_graph_node_set():
 
     print("test_hash_graph_node_set passed")
 
+def test_memory_budget():
+    g = nx.DiGraph()
+    for i in range(20):
+        g.add_node(i)
+        g.nodes[i]['label'] = 'a'
+    for i in range(20):
+        g.add_edge(i, (i + 1) % 20)
+        g.add_edge(i, (i + 7) % 20)
+
+    estimate = dihash.estimate_memory(g)
+    assert(estimate > 0)
+    assert(dihash.estimate_memory(g, apply_quotient=True) > estimate)
+
+    with pytest.raises(dihash.MemoryBudgetExceeded):
+        dihash.hash_graph(g, memory_budget=estimate - 1)
+    with pytest.raises(MemoryError):
+        dihash.hash_graph_node_set(g, {0, 1}, memory_budget=estimate)
+    with pytest.raises(dihash.MemoryBudgetExceeded):
+        dihash.merkle_hash_graph(g, memory_budget=estimate)
+
+    assert(dihash.hash_graph(g, memory_budget=estimate) == dihash.hash_graph(g))
+    assert(dihash.merkle_hash_graph(g, memory_budget=10 * estimate)[2] == dihash.merkle_hash_graph(g)[2])
+
+    print("test_memory_budget passed")
+
+def test_memory_estimate():
+    import tracemalloc
+    # A dense graph, where the canonical adjacency list and the summary string dominate
+    g = random_labeled_graph(200, 12000, 0)
+    # Hash once first, so that the peak does not include the modules imported by the first call
+    dihash.hash_graph(g)
+    tracemalloc.start()
+    try:
+        dihash.hash_graph(g)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.reset_peak()
+        dihash.merkle_hash_graph(g)
+        merkle_peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    assert(dihash.estimate_memory(g) >= peak)
+    # merkle_hash_graph also computes the condensation, which the estimate covers
+    assert(dihash.estimate_merkle_memory(g, nx.condensation(g)) >= merkle_peak)
+
+    print("test_memory_estimate passed")
+
+def test_merkle_checkpoint(tmp_path):
+    # A chain of 3-cycles, so that every SCC depends on the next one
+    g = nx.DiGraph()
+    num_sccs = 30
+    for i in range(num_sccs):
+        for j in range(3):
+            g.add_node((i, j))
+            g.nodes[(i, j)]['label'] = 'a'
+        g.add_edge((i, 0), (i, 1))
+        g.add_edge((i, 1), (i, 2))
+        g.add_edge((i, 2), (i, 0))
+        if i + 1 < num_sccs:
+            g.add_edge((i, 0), (i + 1, 0))
+
+    (_, _, expected_node_hashes) = dihash.merkle_hash_graph(g)
+
+    class Killed(Exception):
+        pass
+
+    num_calls = [0]
+    def killed_hash(s):
+        num_calls[0] += 1
+        if num_calls[0] > 100:
+            raise Killed()
+        return dihash.hash_sha256(s)
+
+    checkpoint = str(tmp_path / 'merkle.checkpoint')
+    with pytest.raises(Killed):
+        dihash.merkle_hash_graph(g, string_hash_fun=killed_hash, checkpoint=checkpoint, checkpoint_interval=4)
+    (records, _) = dihash.read_checkpoint(checkpoint)
+    assert(0 < len(records) < num_sccs)
+
+    # Simulate a record that was only partially written
+    with open(checkpoint, 'ab') as f:
+        f.write(b'\x80\x04\x95')
+
+    num_calls[0] = -10000
+    # Resuming into a different file copies the resumed records, so the new checkpoint is complete
+    other_checkpoint = str(tmp_path / 'other.checkpoint')
+    (_, _, node_hashes) = dihash.merkle_hash_graph(g, string_hash_fun=killed_hash, checkpoint=other_checkpoint, resume_from=checkpoint)
+    assert(node_hashes == expected_node_hashes)
+    (other_records, _) = dihash.read_checkpoint(other_checkpoint)
+    assert(len(other_records) == num_sccs)
+    assert({r[0] for r in other_records} == {frozenset((i, j) for j in range(3)) for i in range(num_sccs)})
+
+    progress_calls = []
+    (scc_hashes, cond, node_hashes) = dihash.merkle_hash_graph(g, string_hash_fun=killed_hash, checkpoint=checkpoint, resume_from=checkpoint,
+                                                               progress=lambda done, total, rate: progress_calls.append((done, total)))
+    assert(node_hashes == expected_node_hashes)
+    assert(len(progress_calls) == num_sccs - len(records))
+    assert(progress_calls[0] == (len(records) + 1, num_sccs))
+    assert(progress_calls[-1] == (num_sccs, num_sccs))
+
+    (records, _) = dihash.read_checkpoint(checkpoint)
+    assert(len(records) == num_sccs)
+
+    with pytest.raises(ValueError):
+        dihash.merkle_hash_graph(g, apply_quotient=True, resume_from=checkpoint)
+
+    # With nodes_to_hash, the total only counts the SCCs reachable from those nodes
+    progress_calls = []
+    (_, _, node_hashes) = dihash.merkle_hash_graph(g, nodes_to_hash=[(20, 1), (25, 0)], progress=lambda done, total, rate: progress_calls.append((done, total)))
+    assert(node_hashes == {n: h for (n, h) in expected_node_hashes.items() if n[0] >= 20})
+    assert(progress_calls == [(i, 10) for i in range(1, 11)])
+
+    print("test_merkle_checkpoint passed")
+
+def test_threaded_hashing():
+    graphs = [random_labeled_graph(40, 60, i) for i in range(20)]
+
+    assert(dihash.hash_graphs_threaded(graphs, max_workers=4) == [dihash.hash_graph(g) for g in graphs])
+
+    for g in graphs:
+        expected = dihash.merkle_hash_graph(g)
+        (scc_hashes, _, node_hashes) = dihash.merkle_hash_graph(g, max_workers=4)
+        assert(scc_hashes == expected[0])
+        assert(node_hashes == expected[2])
+
+        precomputed_hashes = {0: expected[2][0]}
+        nodes_to_hash = [1, 2, 3]
+        expected = dihash.merkle_hash_graph(g, nodes_to_hash=nodes_to_hash, precomputed_hashes=precomputed_hashes)
+        actual = dihash.merkle_hash_graph(g, nodes_to_hash=nodes_to_hash, precomputed_hashes=precomputed_hashes, max_workers=4)
+        assert(actual[0] == expected[0])
+        assert(actual[2] == expected[2])
+
+    # Many threads calling the hashing functions at once
+    expected = [dihash.merkle_hash_graph(g)[2] for g in graphs]
+    def merkle_node_hashes(g):
+        return dihash.merkle_hash_graph(g)[2]
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        assert(list(executor.map(merkle_node_hashes, graphs * 4)) == expected * 4)
+
+    print("test_threaded_hashing passed")
+
+def test_isomorphism():
+    for i in range(20):
+        g1 = random_labeled_graph(12, 30, i)
+        # A relabeled copy of g1 whose nodes are inserted in a different order
+        permutation = list(range(12))
+        random.Random(i).shuffle(permutation)
+        g2 = nx.DiGraph()
+        for n in reversed(list(g1.nodes)):
+            g2.add_node(('n', permutation[n]), label=g1.nodes[n]['label'])
+        g2.add_edges_from((('n', permutation[s]), ('n', permutation[t])) for (s, t) in g1.edges)
+
+        res1 = dihash.hash_graph(g1, return_canonical=True)
+        res2 = dihash.hash_graph(g2, return_canonical=True)
+        assert(res1[:2] == dihash.hash_graph(g1))
+        mapping = dihash.isomorphism(g1, res1, g2, res2)
+        assert(sorted(mapping.keys()) == sorted(g1.nodes))
+        assert(sorted(mapping.values()) == sorted(g2.nodes))
+        for n in g1.nodes:
+            assert(g1.nodes[n]['label'] == g2.nodes[mapping[n]]['label'])
+            assert(res1[1][n] == res2[1][mapping[n]])
+        assert(set((mapping[s], mapping[t]) for (s, t) in g1.edges) == set(g2.edges))
+
+        # Nodes have the same orbit id if and only if they have the same hash
+        (canonical_order, orbit_ids) = res1[2]
+        nodes = list(g1.nodes)
+        assert(sorted(canonical_order) == list(range(12)))
+        for j in range(12):
+            for k in range(12):
+                assert((orbit_ids[j] == orbit_ids[k]) == (res1[1][nodes[j]] == res1[1][nodes[k]]))
+
+        g3 = g1.copy()
+        g3.remove_edge(*next(iter(g3.edges)))
+        assert(dihash.isomorphism(g1, res1, g3, dihash.hash_graph(g3, return_canonical=True)) is None)
+
+    empty = nx.DiGraph()
+    res = dihash.hash_graph(empty, hash_nodes=False, return_canonical=True)
+    assert(dihash.isomorphism(empty, res, empty, res) == {})
+
+    with pytest.raises(ValueError):
+        dihash.hash_graph(g1, apply_quotient=True, return_canonical=True)
+    with pytest.raises(ValueError):
+        dihash.isomorphism(g1, dihash.hash_graph(g1), g1, dihash.hash_graph(g1))
+
+    print("test_isomorphism passed")
+
 #test_quotient()
 #test_hash_graph()
 #test_merkle_hash_graph()
 #test_iso_duplicate_removal()
 #test_edge_encoding()
+#test_quotient_trivial_sccs()
 #test_hash_graph_node_set()
+#test_memory_budget()
+#test_memory_estimate()
+#test_merkle_checkpoint()
+#test_threaded_hashing()
+#test_isomorphism()
 
 #print("All tests passed!")
@@ -0,0 +1,63 @@
+import random
+import networkx as nx
+from .gen_graphs import *
+import dihash
+import dihash.invariant
+import pytest
+
+def test_quick_invariant():
+    g = random_labeled_graph(30, 90, 0)
+
+    nodes = list(g.nodes())
+    random.Random(0).shuffle(nodes)
+    h = nx.relabel_nodes(g, {n: 'n' + str(i) for (i, n) in enumerate(nodes)})
+
+    assert(dihash.quick_invariant(g) == dihash.quick_invariant(h))
+
+    h.nodes['n0']['label'] = 'c'
+    assert(dihash.quick_invariant(g) != dihash.quick_invariant(h))
+
+    g.graph['label'] = 'graph'
+    assert(dihash.quick_invariant(g) != dihash.quick_invariant(nx.DiGraph(g, label='other')))
+
+    print("test_quick_invariant passed")
+
+def test_quick_invariant_small_graphs(monkeypatch):
+    graphs = random_labeled_graphs(40) + [random_labeled_graph(50, 200, 0)]
+    expected = [dihash.quick_invariant(g) for g in graphs]
+
+    # Refine every graph with Python integers, then every graph with NumPy
+    for small_graph_size in [10 ** 9, 0]:
+        monkeypatch.setattr(dihash.invariant, 'SMALL_GRAPH_SIZE', small_graph_size)
+        assert([dihash.quick_invariant(g) for g in graphs] == expected)
+
+    print("test_quick_invariant_small_graphs passed")
+
+def test_dedup_graphs(monkeypatch):
+    graphs = generate_graphs_generic(3, lambda graphs, g: True)
+    random.Random(0).shuffle(graphs)
+
+    num_hashed = [0]
+    def counting_hash(s):
+        num_hashed[0] += 1
+        return dihash.hash_sha256(s)
+
+    representatives = dihash.dedup_graphs(graphs, string_hash_fun=counting_hash)
+    assert(num_hashed[0] == len(graphs))
+
+    # Only graphs with colliding invariants are hashed when no graph counts as small
+    monkeypatch.setattr(dihash.invariant, 'DEDUP_DIRECT_HASH_SIZE', 0)
+    num_hashed[0] = 0
+    assert(dihash.dedup_graphs(graphs, string_hash_fun=counting_hash) == representatives)
+    assert(num_hashed[0] < len(graphs))
+
+    first_index = {}
+    expected = []
+    for (i, g) in enumerate(graphs):
+        (g_hash, _) = dihash.hash_graph(g, hash_nodes=False)
+        expected.append(first_index.setdefault(g_hash, i))
+
+    assert(representatives == expected)
+    assert(len(set(representatives)) == 104)
+
+    print("test_dedup_graphs passed")
@@ -0,0 +1,198 @@
+import os
+import tempfile
+import threading
+import time
+import networkx as nx
+from .gen_graphs import *
+import dihash
+from dihash import server, wire
+from dihash.client import HashClient
+import pytest
+
+def start_server(socket_path, processes):
+    hash_server = server.HashServer(str(socket_path), processes=processes)
+    thread = threading.Thread(target=hash_server.serve_forever)
+    thread.start()
+    return (hash_server, thread)
+
+def stop_server(hash_server, thread):
+    hash_server.shutdown()
+    thread.join()
+    hash_server.server_close()
+
+def test_wire_format():
+    edges = [(0, 1), (1, 2), (2, 0), (2, 2)]
+    labels = ['a', 'b', 'a']
+    body = wire.encode_hash_request(3, edges, labels, 'g', False)
+    assert(wire.decode_hash_request(body) == (3, edges, labels, 'g', False))
+    assert(wire.decode_hash_request(wire.encode_hash_request(0, [], [])) == (0, [], [], None, True))
+
+    response = wire.encode_hash_response('h', ['x', 'y', 'x'])
+    assert(wire.decode_hash_response(response) == ('h', ['x', 'y', 'x']))
+    assert(wire.decode_hash_response(wire.encode_hash_response('h', None)) == ('h', None))
+
+    with pytest.raises(ValueError):
+        wire.decode_hash_request(wire.encode_hash_request(2, [(0, 2)], ['a', 'a']))
+    with pytest.raises(ValueError):
+        wire.decode_hash_request(body[:-1])
+    with pytest.raises(ValueError):
+        wire.decode_hash_response(wire.encode_error('message'))
+
+    print("test_wire_format passed")
+
+def test_server_hashing(tmp_path):
+    graphs = random_labeled_graphs(30)
+    (hash_server, thread) = start_server(tmp_path / 'dihash.sock', processes=2)
+    try:
+        with HashClient(str(tmp_path / 'dihash.sock'), fallback=False) as client:
+            for g in graphs:
+                assert(client.hash_graph(g) == dihash.hash_graph(g))
+                assert(client.hash_graph(g, hash_nodes=False) == dihash.hash_graph(g, hash_nodes=False))
+            stats = client.stats()
+            assert(stats['hash_requests'] == 2 * len(graphs))
+            # Some of the smallest graphs are complete graphs, which are only hashed once
+            assert(stats['hashed'] + stats['cache_hits'] == 2 * len(graphs))
+            assert(stats['cache_entries'] == stats['hashed'])
+
+            # The second time, every result comes from the cache
+            for g in graphs:
+                assert(client.hash_graph(g) == dihash.hash_graph(g))
+            assert(client.stats()['cache_hits'] == stats['cache_hits'] + len(graphs))
+
+            with pytest.raises(ValueError):
+                client.hash_indexed_graph(2, [(0, 5)], ['a', 'a'])
+            stats = client.stats()
+            assert(stats['errors'] == 1)
+            assert(stats['requests'] == 3 * len(graphs) + 3)
+            assert(stats['latency_ms']['count'] == stats['requests'])
+            assert(stats['throughput'] > 0)
+
+        # The module level function connects for a single request
+        g = graphs[5]
+        assert(dihash.client.hash_graph(g, socket_path=str(tmp_path / 'dihash.sock')) == dihash.hash_graph(g))
+
+        # A second server cannot use the socket while the first one is running
+        with pytest.raises(OSError):
+            server.HashServer(str(tmp_path / 'dihash.sock'), processes=0)
+    finally:
+        stop_server(hash_server, thread)
+
+    print("test_server_hashing passed")
+
+def test_server_coalescing(tmp_path, monkeypatch):
+    # Slow down hashing, so that all requests arrive while the first one is being hashed
+    hash_request = server.hash_request
+    def slow_hash_request(body):
+        time.sleep(0.3)
+        return hash_request(body)
+    monkeypatch.setattr(server, 'hash_request', slow_hash_request)
+
+    g = random_labeled_graphs(8)[7]
+    (hash_server, thread) = start_server(tmp_path / 'dihash.sock', processes=0)
+    try:
+        results = [None] * 8
+        def hash_in_thread(i):
+            with HashClient(str(tmp_path / 'dihash.sock'), fallback=False) as client:
+                results[i] = client.hash_graph(g)
+        threads = [threading.Thread(target=hash_in_thread, args=(i,)) for i in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert(results == [dihash.hash_graph(g)] * 8)
+        stats = hash_server.stats()
+        assert(stats['hashed'] == 1)
+        assert(stats['coalesced'] + stats['cache_hits'] == 7)
+        assert(stats['coalesced'] > 0)
+    finally:
+        stop_server(hash_server, thread)
+
+    print("test_server_coalescing passed")
+
+def test_client_fallback(tmp_path):
+    graphs = random_labeled_graphs(5)
+    socket_path = str(tmp_path / 'dihash.sock')
+    client = HashClient(socket_path)
+    for g in graphs:
+        assert(client.hash_graph(g) == dihash.hash_graph(g))
+    assert(client.stats() is None)
+    with pytest.raises(ConnectionError):
+        HashClient(socket_path, fallback=False).hash_graph(graphs[0])
+
+    # The client falls back to hashing in process when the server stops, and reconnects when it is back
+    (hash_server, thread) = start_server(socket_path, processes=0)
+    try:
+        assert(client.hash_graph(graphs[1]) == dihash.hash_graph(graphs[1]))
+        assert(client.stats()['hashed'] == 1)
+    finally:
+        stop_server(hash_server, thread)
+    assert(client.hash_graph(graphs[2]) == dihash.hash_graph(graphs[2]))
+    (hash_server, thread) = start_server(socket_path, processes=0)
+    try:
+        assert(client.hash_graph(graphs[3]) == dihash.hash_graph(graphs[3]))
+        assert(client.stats()['hashed'] == 1)
+    finally:
+        stop_server(hash_server, thread)
+    client.close()
+
+    print("test_client_fallback passed")
+
+def test_socket_security(tmp_path, monkeypatch):
+    monkeypatch.delenv('DIHASH_SOCKET', raising=False)
+    monkeypatch.setenv('XDG_RUNTIME_DIR', str(tmp_path / 'run'))
+    assert(wire.default_socket_path() == str(tmp_path / 'run' / 'dihash.sock'))
+
+    # Without XDG_RUNTIME_DIR, the server creates a private directory in the temporary directory
+    monkeypatch.delenv('XDG_RUNTIME_DIR')
+    monkeypatch.setattr(tempfile, 'tempdir', str(tmp_path))
+    socket_dir = tmp_path / 'dihash-{}'.format(os.getuid())
+    assert(wire.default_socket_path() == str(socket_dir / 'dihash.sock'))
+    g = random_labeled_graphs(4)[3]
+    hash_server = server.HashServer(processes=0)
+    thread = threading.Thread(target=hash_server.serve_forever)
+    thread.start()
+    try:
+        assert(os.stat(socket_dir).st_mode & 0o777 == 0o700)
+        with HashClient(fallback=False) as client:
+            assert(client.hash_graph(g) == dihash.hash_graph(g))
+
+        # Clients do not trust a socket owned by another user
+        uid = os.getuid()
+        monkeypatch.setattr(os, 'getuid', lambda: uid + 1)
+        with pytest.raises(ConnectionError):
+            HashClient(fallback=False).hash_graph(g)
+        assert(HashClient().hash_graph(g) == dihash.hash_graph(g))
+        monkeypatch.undo()
+    finally:
+        stop_server(hash_server, thread)
+
+    # A directory that other users can access is rejected
+    shared_dir = tmp_path / 'shared'
+    shared_dir.mkdir()
+    os.chmod(shared_dir, 0o777)
+    with pytest.raises(OSError):
+        wire.make_private_dir(str(shared_dir))
+
+    print("test_socket_security passed")
+
+def test_client_timeout(tmp_path, monkeypatch):
+    hash_request = server.hash_request
+    def slow_hash_request(body):
+        time.sleep(0.5)
+        return hash_request(body)
+    monkeypatch.setattr(server, 'hash_request', slow_hash_request)
+
+    g = random_labeled_graphs(4)[3]
+    (hash_server, thread) = start_server(tmp_path / 'dihash.sock', processes=0)
+    try:
+        # A request that times out falls back to hashing in process, and is not sent to the server again
+        with HashClient(str(tmp_path / 'dihash.sock'), timeout=0.1) as client:
+            assert(client.hash_graph(g) == dihash.hash_graph(g))
+        with pytest.raises(ConnectionError):
+            HashClient(str(tmp_path / 'dihash.sock'), timeout=0.1, fallback=False).hash_graph(g)
+        time.sleep(1)
+        assert(hash_server.stats()['hash_requests'] == 2)
+    finally:
+        stop_server(hash_server, thread)
+
+    print("test_client_timeout passed")
@@ -0,0 +1,45 @@
+import multiprocessing
+import networkx as nx
+from .gen_graphs import *
+import dihash
+from dihash.shared_graph import SharedGraphBatch, hash_shared_graphs, hash_graphs_shared
+import pytest
+
+def test_shared_graph_batch():
+    graphs = random_labeled_graphs(10, max_nodes=8)
+    with SharedGraphBatch(graphs) as batch:
+        # Hash in this process, as a worker would
+        hash_shared_graphs(batch.spec, 0, len(batch))
+        for (i, g) in enumerate(graphs):
+            assert((batch.graph_hash(i), batch.node_hashes(i)) == dihash.hash_graph(g))
+
+    print("test_shared_graph_batch passed")
+
+def test_hash_graphs_shared():
+    graphs = random_labeled_graphs(40, max_nodes=8)
+    with multiprocessing.Pool(2) as pool:
+        results = hash_graphs_shared(graphs, pool=pool, chunksize=7)
+        results_no_nodes = hash_graphs_shared(graphs, pool=pool, hash_nodes=False)
+    assert(results == [dihash.hash_graph(g) for g in graphs])
+    assert(results_no_nodes == [(dihash.hash_graph(g, hash_nodes=False)[0], None) for g in graphs])
+
+    print("test_hash_graphs_shared passed")
+
+def test_shared_scc_graphs():
+    g = nx.DiGraph()
+    for i in range(6):
+        g.add_node(i)
+        g.nodes[i]['label'] = 'a'
+    g.add_edges_from([(0, 1), (1, 0), (1, 2), (2, 3), (3, 4), (4, 2), (4, 5)])
+    (scc_hashes, cond, node_hashes) = dihash.merkle_hash_graph(g)
+
+    # Pack the SCCs whose successors have been hashed, together with the hashes of those successors
+    sccs = [frozenset(cond.nodes[scc]['members']) for scc in cond.nodes]
+    graphs = [dihash.scc_graph(g, members, node_hashes) for members in sccs]
+    results = hash_graphs_shared(graphs, processes=2)
+
+    for (members, (scc_hash, scc_node_hashes)) in zip(sccs, results):
+        assert(scc_hash == scc_hashes[cond.graph['mapping'][next(iter(members))]])
+        assert(scc_node_hashes == {n: node_hashes[n] for n in members})
+
+    print("test_shared_scc_graphs passed")
@@ -0,0 +1,143 @@
+import itertools
+import random
+import networkx as nx
+import pynauty
+import dihash
+from dihash.generate import generate_digraphs, digraph_to_networkx
+from dihash.tree import hash_tree, is_out_forest, is_out_tree, TREE_HASH_VERSION
+import pytest
+
+# Checks that hash_tree identifies and distinguishes the graphs and the nodes of every graph exactly as
+# hash_graph does. Returns the number of distinct graphs.
+def check_same_partitions(graphs):
+    tree_to_nauty = {}
+    nauty_to_tree = {}
+    for g in graphs:
+        (tree_hash, tree_node_hashes) = hash_tree(g)
+        (nauty_hash, nauty_node_hashes) = dihash.hash_graph(g)
+        assert(tree_to_nauty.setdefault(tree_hash, nauty_hash) == nauty_hash)
+        assert(nauty_to_tree.setdefault(nauty_hash, tree_hash) == tree_hash)
+        assert(hash_tree(g, hash_nodes=False) == (tree_hash, None))
+        for a in g.nodes:
+            for b in g.nodes:
+                assert((tree_node_hashes[a] == tree_node_hashes[b]) == (nauty_node_hashes[a] == nauty_node_hashes[b]))
+    return len(tree_to_nauty)
+
+def random_forest(num_nodes, num_roots, seed):
+    r = random.Random(seed)
+    g = nx.DiGraph()
+    for i in range(num_nodes):
+        g.add_node(i)
+        g.nodes[i]['label'] = r.choice('ab')
+        if i >= num_roots:
+            g.add_edge(r.randrange(i), i)
+    return g
+
+def test_hash_tree():
+    # All unlabeled out-forests with up to 5 nodes. The number of isomorphism classes is the number of
+    # rooted trees with one more node, OEIS A000081.
+    for (num_nodes, count) in enumerate([1, 1, 2, 4, 9, 20]):
+        forests = [g for g in map(digraph_to_networkx, generate_digraphs(num_nodes)) if is_out_forest(g)]
+        assert(len(forests) == count)
+        assert(check_same_partitions(forests) == count)
+
+    # All labelings of the out-forests with up to 4 nodes, with and without a graph label
+    for num_nodes in range(1, 5):
+        graphs = []
+        for g in map(digraph_to_networkx, generate_digraphs(num_nodes)):
+            if not is_out_forest(g):
+                continue
+            for labels in itertools.product('ab', repeat=num_nodes):
+                labeled = g.copy()
+                for (n, label) in enumerate(labels):
+                    labeled.nodes[n]['label'] = label
+                graphs.append(labeled)
+                graph_labeled = labeled.copy()
+                graph_labeled.graph['label'] = 'graph_label'
+                graphs.append(graph_labeled)
+        check_same_partitions(graphs)
+
+    # Random forests and relabeled copies, whose nodes are inserted in a different order
+    graphs = []
+    for i in range(30):
+        g = random_forest(10 + i, 1 + i % 4, i)
+        permutation = list(g.nodes)
+        random.Random(i).shuffle(permutation)
+        copy = nx.relabel_nodes(g, {n: ('n', p) for (n, p) in zip(g.nodes, permutation)})
+        copy = nx.DiGraph(copy.subgraph(reversed(list(copy.nodes))))
+        assert(hash_tree(g)[0] == hash_tree(copy)[0])
+        graphs.extend([g, copy])
+    assert(check_same_partitions(graphs) == 30)
+
+    with pytest.raises(ValueError):
+        hash_tree(nx.DiGraph([(0, 1), (1, 0)]))
+
+    print("test_hash_tree passed")
+
+def test_hash_tree_canonical(monkeypatch):
+    def no_nauty(*args):
+        raise AssertionError("nauty was called")
+    monkeypatch.setattr(pynauty, 'canon_label', no_nauty)
+    monkeypatch.setattr(pynauty, 'autgrp', no_nauty)
+
+    for i in range(20):
+        g1 = random_forest(20 + i, 1 + i % 3, i)
+        # A relabeled copy of g1 whose nodes are inserted in a different order
+        permutation = list(g1.nodes)
+        random.Random(i).shuffle(permutation)
+        g2 = nx.relabel_nodes(g1, {n: ('n', p) for (n, p) in zip(g1.nodes, permutation)})
+        g2 = nx.DiGraph(g2.subgraph(reversed(list(g2.nodes))))
+
+        res1 = hash_tree(g1, return_canonical=True)
+        res2 = hash_tree(g2, return_canonical=True)
+        assert(res1[:2] == hash_tree(g1))
+        assert(hash_tree(g1, hash_nodes=False, return_canonical=True) == (res1[0], None, res1[2]))
+        mapping = dihash.isomorphism(g1, res1, g2, res2)
+        assert(sorted(mapping.values(), key=str) == sorted(g2.nodes, key=str))
+        for n in g1.nodes:
+            assert(g1.nodes[n]['label'] == g2.nodes[mapping[n]]['label'])
+            assert(res1[1][n] == res2[1][mapping[n]])
+        assert(set((mapping[s], mapping[t]) for (s, t) in g1.edges) == set(g2.edges))
+
+        # Nodes have the same orbit id if and only if they have the same hash
+        (canonical_order, orbit_ids) = res1[2]
+        nodes = list(g1.nodes)
+        assert(sorted(canonical_order) == list(range(len(nodes))))
+        for j in range(len(nodes)):
+            for k in range(len(nodes)):
+                assert((orbit_ids[j] == orbit_ids[k]) == (res1[1][nodes[j]] == res1[1][nodes[k]]))
+
+        g3 = g1.copy()
+        g3.nodes[nodes[-1]]['label'] = 'c'
+        assert(dihash.isomorphism(g1, res1, g3, hash_tree(g3, return_canonical=True)) is None)
+
+    empty = nx.DiGraph()
+    res = hash_tree(empty, hash_nodes=False, return_canonical=True)
+    assert(dihash.isomorphism(empty, res, empty, res) == {})
+
+    print("test_hash_tree_canonical passed")
+
+def test_tree_detection(monkeypatch):
+    assert(is_out_forest(nx.DiGraph()))
+    assert(not is_out_tree(nx.DiGraph()))
+    assert(is_out_tree(nx.DiGraph([(0, 1), (0, 2), (2, 3)])))
+    assert(is_out_forest(nx.DiGraph([(0, 1), (2, 3)])))
+    assert(not is_out_tree(nx.DiGraph([(0, 1), (2, 3)])))
+    # A node with two parents, a cycle, a self loop and a cycle below a root
+    assert(not is_out_forest(nx.DiGraph([(0, 2), (1, 2)])))
+    assert(not is_out_forest(nx.DiGraph([(0, 1), (1, 2), (2, 0)])))
+    assert(not is_out_forest(nx.DiGraph([(0, 0)])))
+    assert(not is_out_forest(nx.DiGraph([(0, 1), (2, 3), (3, 2)])))
+
+    # Tree hashes are versioned and never call nauty
+    def no_nauty(*args):
+        raise AssertionError("nauty was called")
+    monkeypatch.setattr(pynauty, 'canon_label', no_nauty)
+    monkeypatch.setattr(pynauty, 'autgrp', no_nauty)
+    g = random_forest(1000, 3, 0)
+    (g_hash, node_hashes) = hash_tree(g)
+    assert(len(node_hashes) == 1000)
+    empty = nx.DiGraph()
+    assert(hash_tree(empty) == (dihash.hash_sha256(dihash.to_str(('tree', TREE_HASH_VERSION, [], []))), {}))
+
+    print("test_tree_detection passed")